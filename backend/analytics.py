@@ -0,0 +1,145 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Date, cast, func, literal, or_, select
+
+import models
+from money import cents_to_float
+
+# Periods are cut in the household's local time, like the Tableau extract.
+REPORTING_TIMEZONE = os.getenv("REPORTING_TIMEZONE", "America/Sao_Paulo")
+
+GRAINS = ("day", "week", "month")
+
+F = models.FactExpenditure
+R = models.FactExpenditureMonthly
+
+DIMENSIONS = ("category", "primary_category", "payment_method", "user", "is_shared", "nature")
+
+
+def dimension_columns(source, dimension: str) -> list:
+    """
+    Columns a dimension adds to the result. `source` is the fact table or its monthly rollup,
+    which share the key columns.
+    """
+    return {
+        "category": [source.category_id, models.DimCategory.primary_category, models.DimCategory.sub_category],
+        "primary_category": [models.DimCategory.primary_category],
+        "payment_method": [source.payment_method_id, models.DimPaymentMethod.method_name, models.DimPaymentMethod.institution],
+        "user": [source.user_id, models.DimUser.full_name],
+        "is_shared": [source.is_shared],
+        "nature": [source.nature],
+    }[dimension]
+
+
+def dimension_join(source, dimension: str):
+    """
+    Dimension table (and join condition) a dimension needs, or `None`.
+    """
+    return {
+        "category": (models.DimCategory, source.category_id == models.DimCategory.category_id),
+        "primary_category": (models.DimCategory, source.category_id == models.DimCategory.category_id),
+        "payment_method": (models.DimPaymentMethod, source.payment_method_id == models.DimPaymentMethod.payment_method_id),
+        "user": (models.DimUser, source.user_id == models.DimUser.user_id),
+    }.get(dimension)
+
+
+def period_of(grain: str, timestamp):
+    """
+    SQL expression with the first day of the period `timestamp` falls in, in the reporting time zone.
+
+    :param grain: Period size, one of `GRAINS`.
+    :type grain: str
+    :param timestamp: A `timestamptz` column or expression.
+    """
+    # Inline the constants so the same expression in SELECT and GROUP BY is textually identical.
+    return cast(
+        func.date_trunc(
+            literal(grain, literal_execute=True),
+            func.timezone(literal(REPORTING_TIMEZONE, literal_execute=True), timestamp),
+        ),
+        Date,
+    )
+
+
+def build_summary_query(
+    user_id: int,
+    grain: str = "month",
+    dimensions: list[str] | None = None,
+    nature: str | None = None,
+    is_shared: bool | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+):
+    """
+    Builds a single GROUP BY query with spend totals per period (and per dimension).
+
+    Only expenditures the user may see are counted: their own, plus shared ones.
+    Monthly summaries without a date range are read from the monthly rollup instead of the fact table.
+
+    :param user_id: ID of the logged-in user.
+    :type user_id: int
+    :param grain: Period size, one of `GRAINS`.
+    :type grain: str
+    :param dimensions: Extra grouping keys, from `DIMENSIONS`.
+    :type dimensions: list[str] | None
+    :return: The statement, and the names of its columns in order.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain: {grain}")
+    dimensions = list(dict.fromkeys(dimensions or []))
+
+    # Rollup months can't be split, so a date range needs the fact table.
+    use_rollup = grain == "month" and start_date is None and end_date is None
+    if use_rollup:
+        source = R
+        period = R.month.label("period")
+        total_cents, count = func.sum(R.total_cents), func.sum(R.expenditure_count)
+    else:
+        source = F
+        period = period_of(grain, F.transaction_timestamp).label("period")
+        total_cents, count = func.sum(F.price_cents), func.count()
+    # Totals are summed in integer cents (exact); `to_columns` turns them into amounts.
+    measures = [cast(total_cents, BigInteger).label("total"), count.label("count")]
+
+    group_columns = [period]
+    for dimension in dimensions:
+        for column in dimension_columns(source, dimension):
+            if not any(column is existing for existing in group_columns):
+                group_columns.append(column)
+
+    stmt = select(*group_columns, *measures).select_from(source)
+
+    joined = set()
+    for dimension in dimensions:
+        join = dimension_join(source, dimension)
+        if join and join[0] not in joined:
+            stmt = stmt.outerjoin(*join)
+            joined.add(join[0])
+
+    stmt = stmt.where(or_(source.user_id == user_id, source.is_shared == True))
+    if nature is not None:
+        stmt = stmt.where(source.nature == nature)
+    if is_shared is not None:
+        stmt = stmt.where(source.is_shared == is_shared)
+    if start_date:
+        stmt = stmt.where(F.transaction_timestamp >= start_date)
+    if end_date:
+        stmt = stmt.where(F.transaction_timestamp < end_date)
+
+    stmt = stmt.group_by(*group_columns).order_by(*group_columns)
+    column_names = [column.key if column is not period else "period" for column in group_columns] + ["total", "count"]
+    return stmt, column_names
+
+
+def to_columns(rows, column_names: list[str]) -> dict[str, list]:
+    """
+    Pivots result rows into one list per column. `total` goes from cents to an amount.
+    """
+    columns = {name: [] for name in column_names}
+    for row in rows:
+        for name, value in zip(column_names, row):
+            columns[name].append(value)
+    if "total" in columns:
+        columns["total"] = [cents_to_float(cents) for cents in columns["total"]]
+    return columns
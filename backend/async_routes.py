@@ -0,0 +1,257 @@
+from datetime import datetime
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import schemas
+import rollup
+import partitions
+from auth import Principal, resolve_principal, invalidate_user
+from database import AsyncSessionLocal, async_engine, engine
+from queries import ExpenditureFilters, build_expenditure_page_query, build_export_query, to_page, to_columnar, visible_expenditure_query
+from analytics import build_summary_query, to_columns
+from dimension_cache import dimension_cache, list_response
+from export import MEDIA_TYPES, stream_export_async
+
+# Async versions of the CRUD and listing routes in main.py, served when DB_ASYNC is set.
+# They await the database on the event loop instead of holding a threadpool thread per request.
+router = APIRouter()
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+async def get_async_db():
+    """
+    - For each incoming request, opens a new async database session and then makes sure to close it when the request is finished.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """
+    Same as `main.get_current_user`, sharing its principal cache.
+    """
+    async def load_user(email: str):
+        return (await db.execute(select(models.DimUser).where(models.DimUser.email == email))).scalars().first()
+
+    return await resolve_principal(token, load_user)
+
+
+@router.post("/expenditures/", response_model=schemas.ExpenditureCreate)
+async def create_expenditure(
+    expenditure: schemas.ExpenditureCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)):
+    """
+    Creates an expenditure linked to the logged-in user.
+    """
+    db_expenditure = models.FactExpenditure(
+        **expenditure.model_dump(exclude={"user_id"}),
+        user_id=current_user.user_id
+    )
+
+    # Partition DDL goes through the sync engine, once per month and process.
+    if partitions.pending_months([db_expenditure.transaction_timestamp]):
+        # Release the session's connection (from the user lookup) before the DDL takes a sync one.
+        await db.commit()
+        await run_in_threadpool(partitions.ensure_partitions, engine, [db_expenditure.transaction_timestamp])
+    db.add(db_expenditure)
+    await db.flush()
+    row = rollup.as_rollup_row(db_expenditure)
+    await db.run_sync(lambda session: rollup.apply_inserts(session, [row]))
+    await db.commit()
+    await db.refresh(db_expenditure)
+    return db_expenditure
+
+
+@router.post("/categories/", response_model=schemas.Category)
+async def create_category(category: schemas.CategoryCreate, db: AsyncSession = Depends(get_async_db)):
+    db_category = models.DimCategory(**category.model_dump())
+    db.add(db_category)
+    await db.commit()
+    await db.refresh(db_category)
+    dimension_cache.bump("categories")
+    return db_category
+
+
+@router.post("/payment_methods/", response_model=schemas.PaymentMethod)
+async def create_payment_method(method: schemas.PaymentMethodCreate, db: AsyncSession = Depends(get_async_db)):
+    db_method = models.DimPaymentMethod(**method.model_dump())
+    db.add(db_method)
+    await db.commit()
+    await db.refresh(db_method)
+    dimension_cache.bump("payment_methods")
+    return db_method
+
+
+@router.get("/users/", response_model=List[schemas.User])
+async def get_users(request: Request, db: AsyncSession = Depends(get_async_db)):
+    entry, version = dimension_cache.get("users")
+    if entry is None:
+        rows = (await db.execute(select(models.DimUser))).scalars().all()
+        entry = dimension_cache.put("users", version, rows, schemas.User)
+    return list_response(request, entry)
+
+
+@router.get("/categories/", response_model=List[schemas.Category])
+async def get_categories(request: Request, db: AsyncSession = Depends(get_async_db)):
+    entry, version = dimension_cache.get("categories")
+    if entry is None:
+        rows = (await db.execute(select(models.DimCategory))).scalars().all()
+        entry = dimension_cache.put("categories", version, rows, schemas.Category)
+    return list_response(request, entry)
+
+
+@router.get("/payment_methods/", response_model=List[schemas.PaymentMethod])
+async def get_payment_methods(request: Request, db: AsyncSession = Depends(get_async_db)):
+    entry, version = dimension_cache.get("payment_methods")
+    if entry is None:
+        rows = (await db.execute(select(models.DimPaymentMethod))).scalars().all()
+        entry = dimension_cache.put("payment_methods", version, rows, schemas.PaymentMethod)
+    return list_response(request, entry)
+
+
+@router.get("/expenditures/", response_model=schemas.ExpenditurePage)
+async def get_expenditures(db: AsyncSession = Depends(get_async_db),
+                           current_user: Principal = Depends(get_current_user_async),
+                           limit: int = Query(100, ge=1, le=500),
+                           cursor: str | None = None,
+                           filters: ExpenditureFilters = Depends(),
+                           format: Literal["json", "columnar"] = "json"):
+    """
+    Own and shared expenditures, newest first, one page at a time (see `main.get_expenditures`).
+    """
+    try:
+        stmt = build_expenditure_page_query(current_user.user_id, filters, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    expenditures = (await db.execute(stmt)).unique().scalars().all()
+    page = to_page(expenditures, limit)
+    if format == "columnar":
+        return JSONResponse(to_columnar(page))
+    return page
+
+
+@router.get("/expenditures/export")
+async def export_expenditures(current_user: Principal = Depends(get_current_user_async),
+                              filters: ExpenditureFilters = Depends(),
+                              format: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Streams every visible expenditure as NDJSON or CSV (see `main.export_expenditures`).
+    """
+    stmt = build_export_query(current_user.user_id, filters)
+    return StreamingResponse(
+        stream_export_async(async_engine, stmt, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="expenditures.{format}"'},
+    )
+
+
+@router.get("/analytics/summary", response_model=schemas.SpendSummary)
+async def get_spend_summary(db: AsyncSession = Depends(get_async_db),
+                            current_user: Principal = Depends(get_current_user_async),
+                            grain: Literal["day", "week", "month"] = "month",
+                            dimensions: List[Literal["category", "primary_category", "payment_method", "user", "is_shared", "nature"]] = Query([]),
+                            nature: str | None = None,
+                            is_shared: bool | None = None,
+                            start_date: datetime | None = None,
+                            end_date: datetime | None = None):
+    """
+    Spend totals and counts per period (see `main.get_spend_summary`).
+    """
+    stmt, column_names = build_summary_query(
+        current_user.user_id,
+        grain=grain,
+        dimensions=dimensions,
+        nature=nature,
+        is_shared=is_shared,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    rows = (await db.execute(stmt)).all()
+    return {
+        "grain": grain,
+        "dimensions": dimensions,
+        "row_count": len(rows),
+        "columns": to_columns(rows, column_names),
+    }
+
+# --- Delete Endpoints ---
+
+@router.delete("/users/{user_id}")
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(models.DimUser, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    try:
+        await db.delete(user)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Cannot delete: This item is used in existing records.")
+
+    invalidate_user(user_id)
+    dimension_cache.bump("users")
+    return {"message": "user deleted successfully"}
+
+
+@router.delete("/categories/{category_id}")
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_async_db)):
+    category = await db.get(models.DimCategory, category_id)
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    try:
+        await db.delete(category)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Cannot delete: This category is used in existign records.")
+
+    dimension_cache.bump("categories")
+    return {"message": "Category deleted successfully"}
+
+
+@router.delete("/payment_methods/{payment_method_id}")
+async def delete_payment_method(payment_method_id: int, db: AsyncSession = Depends(get_async_db)):
+    method = await db.get(models.DimPaymentMethod, payment_method_id)
+    if not method:
+        raise HTTPException(status_code=404, detail="Payment Method not found")
+    try:
+        await db.delete(method)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Cannot delete: this payment method is used in existing records")
+
+    dimension_cache.bump("payment_methods")
+    return {"message": "Payment Method deleted successfully"}
+
+
+@router.delete("/expenditures/{expenditure_id}")
+async def delete_expenditure(
+    expenditure_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)):
+    """
+    Delete an expenditure if the user owns it or it is shared.
+    """
+    exp = (await db.execute(visible_expenditure_query(expenditure_id, current_user.user_id))).scalars().first()
+    if not exp:
+        raise HTTPException(status_code=404, detail="Expenditure not found (or you don't have permission)")
+
+    await db.delete(exp)
+    db.add(models.ExpenditureDeletion(expenditure_id=exp.expenditure_id))
+    await db.flush()
+    await db.run_sync(lambda session: rollup.refresh_group(session, exp))
+    await db.commit()
+    return {"message": "Deleted successfully"}
@@ -1,16 +1,120 @@
+import asyncio
 import bcrypt
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fastapi import HTTPException
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from typing import Optional
 import os
 
+from cache import TTLCache
+from metrics import BCRYPT_SECONDS, BCRYPT_QUEUED_SECONDS, JWT_SECONDS
+
 # 1. Setup password hashing
+# Work factor for new hashes. Existing hashes with another cost are upgraded on login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Hashing runs on its own small pool so a burst of logins can't take over the API's threadpool.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Jobs allowed to wait (or run) at once. Beyond that, requests are turned away with a 503.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
 
 
 # 2. Configuration (come from .env when in prod)
 SECRET_KEY= os.getenv("SECRET_KEY", "super_secret_key_for_dev_only_change_me")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Refresh tokens let the client get new access tokens without the password (see `refresh_tokens.py`).
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+# 3. Authenticated-user cache
+# Keyed by token. An entry never outlives the token's own expiry.
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Lightweight stand-in for the logged-in `DimUser`, safe to keep across requests.
+    """
+    user_id: int
+    email: str
+    full_name: str | None = None
+
+principal_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+# Bumped by every `invalidate_user`. A request notes it before loading the user, and only caches
+# the principal if no invalidation happened in between: otherwise it may have loaded a user that
+# was deleted meanwhile, and caching it would bring the session back for a whole TTL.
+_invalidations = 0
+_invalidation_lock = threading.Lock()
+
+def principal_cache_generation() -> int:
+    """
+    Read before loading a user from the DB; pass it to `cache_principal`.
+    """
+    return _invalidations
+
+def cache_principal(token: str, principal: Principal, generation: int, ttl: float | None = None):
+    """
+    Caches `principal` for `token`, unless a user was invalidated since `generation` was read.
+    """
+    with _invalidation_lock:
+        if generation == _invalidations:
+            principal_cache.set(token, principal, ttl=ttl)
+
+def invalidate_user(user_id: int):
+    """
+    Forgets every cached session of a user (e.g. after the user is deleted).
+    """
+    global _invalidations
+    with _invalidation_lock:
+        _invalidations += 1
+        principal_cache.invalidate_where(lambda principal: principal.user_id == user_id)
+
+async def resolve_principal(token: str, load_user) -> Principal:
+    """
+    Decodes the token, extracts the email, and checks that the user exists.
+    Shared by the sync and async `get_current_user` dependencies.
+
+    The result is cached per token (until the token expires), so repeated
+    requests with the same token skip both the decode and the DB lookup.
+
+    :param token: Bearer token sent by the client.
+    :type token: str
+    :param load_user: Async callable taking an email and returning its `DimUser` (or `None`).
+        Only called on a cache miss.
+    """
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    generation = principal_cache_generation()
+
+    credentials_exception = HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+    try:
+        with JWT_SECONDS.time(operation="decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        email: str | None = payload.get("sub")
+        if email is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+
+    user = await load_user(email)
+    if user is None:
+        raise credentials_exception
+
+    principal = Principal(user_id=user.user_id, email=user.email, full_name=user.full_name)
+    expires_in = payload["exp"] - datetime.now(timezone.utc).timestamp() if "exp" in payload else None
+    cache_principal(token, principal, generation, ttl=expires_in)
+    return principal
 
 def verify_password(plain_password, hashed_password):
     """
@@ -39,12 +143,122 @@ def get_password_hash(password: str) -> str:
     pwd_bytes = password.encode("utf-8")
 
     # Generate salt and hash
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed =bcrypt.hashpw(pwd_bytes, salt)
 
     # Return as string so as it gan be stored in postgres as text
     return hashed.decode("utf-8")
 
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Whether a stored hash was made with a different work factor than `BCRYPT_ROUNDS`.
+    """
+    try:
+        # Format: $2b$<cost>$<salt + hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when too many hashing jobs are already queued.
+    """
+
+
+class HashingStats:
+    """
+    Latency of the hashing pool, per operation: time spent queued and time spent in bcrypt.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops = {}
+        self.rejected = 0
+        self.pending = 0
+
+    def try_acquire(self) -> bool:
+        """
+        Reserves a place in the queue, or counts a rejection if it is full.
+        """
+        with self._lock:
+            if self.pending >= PASSWORD_HASH_MAX_PENDING:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.pending -= 1
+
+    def record(self, operation: str, queued: float, seconds: float):
+        with self._lock:
+            op = self._ops.setdefault(operation, {"count": 0, "seconds_total": 0.0, "seconds_max": 0.0, "queued_seconds_total": 0.0})
+            op["count"] += 1
+            op["seconds_total"] += seconds
+            op["seconds_max"] = max(op["seconds_max"], seconds)
+            op["queued_seconds_total"] += queued
+        BCRYPT_SECONDS.observe(seconds, operation=operation)
+        BCRYPT_QUEUED_SECONDS.observe(queued, operation=operation)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            operations = {
+                name: {
+                    "count": op["count"],
+                    "seconds_avg": round(op["seconds_total"] / op["count"], 6),
+                    "seconds_max": round(op["seconds_max"], 6),
+                    "queued_seconds_avg": round(op["queued_seconds_total"] / op["count"], 6),
+                }
+                for name, op in self._ops.items()
+            }
+            return {
+                "rounds": BCRYPT_ROUNDS,
+                "workers": PASSWORD_HASH_WORKERS,
+                "max_pending": PASSWORD_HASH_MAX_PENDING,
+                "pending": self.pending,
+                "rejected": self.rejected,
+                "operations": operations,
+            }
+
+
+hashing_stats = HashingStats()
+_hashing_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+async def _run_hashing(operation: str, func, *args):
+    """
+    Runs `func` on the hashing pool and awaits it. bcrypt releases the GIL, so the
+    workers hash in parallel while the event loop keeps serving requests.
+    """
+    if not hashing_stats.try_acquire():
+        raise PasswordHashingBusy()
+
+    submitted = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            hashing_stats.record(operation, started - submitted, time.perf_counter() - started)
+
+    try:
+        return await asyncio.wrap_future(_hashing_pool.submit(timed))
+    finally:
+        hashing_stats.release()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    `verify_password` on the hashing pool. Raises `PasswordHashingBusy` when the queue is full.
+    """
+    return await _run_hashing("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    `get_password_hash` on the hashing pool. Raises `PasswordHashingBusy` when the queue is full.
+    """
+    return await _run_hashing("hash", get_password_hash, password)
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
@@ -59,7 +273,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
     to_encode.update({"exp": expire})
 
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    with JWT_SECONDS.time(operation="encode"):
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import os
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+from money import to_cents
+
+# Hard cap on records per request, so a single import can't exhaust memory.
+MAX_BULK_ROWS = int(os.getenv("MAX_BULK_ROWS", "50000"))
+# Records are validated (and their foreign keys checked) this many at a time.
+BULK_BATCH_SIZE = 1000
+
+# Columns written by COPY, in order. `updated_at` comes from the column default.
+COPY_COLUMNS = ["transaction_timestamp", "price_cents", "nature", "is_shared", "user_id", "category_id", "payment_method_id"]
+
+
+def parse_records(body: bytes, content_type: str) -> list[dict]:
+    """
+    Turns the request body into a list of raw records.
+
+    Supports a JSON array (`application/json`), one JSON object per line
+    (`application/x-ndjson`) and CSV with a header row (`text/csv`).
+    Raises `ValueError` if the body can't be parsed, and `TypeError` for any other content type.
+
+    :param body: Raw request body.
+    :type body: bytes
+    :param content_type: Value of the `Content-Type` header.
+    :type content_type: str
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    text = body.decode("utf-8-sig")
+
+    if media_type in ("application/x-ndjson", "application/jsonl", "application/ndjson"):
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif media_type == "text/csv":
+        # Empty cells mean "use the default", not "empty string"
+        try:
+            records = [
+                {key: value for key, value in row.items() if value not in ("", None)}
+                for row in csv.DictReader(io.StringIO(text))
+            ]
+        except csv.Error as e:
+            raise ValueError(str(e)) from e
+    elif media_type in ("application/json", ""):
+        records = json.loads(text)
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array of expenditures")
+    else:
+        raise TypeError(f"Unsupported content type: {media_type}")
+
+    return records
+
+
+def validate_records(db: Session, records: list) -> tuple[list[schemas.ExpenditureCreate], list[dict]]:
+    """
+    Validates every record against `ExpenditureCreate` and checks that the
+    referenced category and payment method exist.
+
+    :return: The valid expenditures, and one error report per rejected record.
+        `row` is the position of the record in the payload, starting at 1.
+    """
+    category_ids = set(db.scalars(select(models.DimCategory.category_id)))
+    payment_method_ids = set(db.scalars(select(models.DimPaymentMethod.payment_method_id)))
+
+    valid, errors = [], []
+    for start in range(0, len(records), BULK_BATCH_SIZE):
+        for offset, record in enumerate(records[start:start + BULK_BATCH_SIZE]):
+            row = start + offset + 1
+            try:
+                expenditure = schemas.ExpenditureCreate.model_validate(record)
+            except ValidationError as e:
+                messages = [f"{'.'.join(str(p) for p in err['loc']) or 'record'}: {err['msg']}" for err in e.errors()]
+                errors.append({"row": row, "errors": messages})
+                continue
+
+            messages = []
+            if expenditure.category_id not in category_ids:
+                messages.append(f"category_id: Category {expenditure.category_id} does not exist")
+            if expenditure.payment_method_id not in payment_method_ids:
+                messages.append(f"payment_method_id: Payment method {expenditure.payment_method_id} does not exist")
+            if messages:
+                errors.append({"row": row, "errors": messages})
+            else:
+                valid.append(expenditure)
+
+    return valid, errors
+
+
+def copy_expenditures(db: Session, expenditures: list[schemas.ExpenditureCreate], user_id: int) -> int:
+    """
+    Loads the expenditures with a single Postgres `COPY`, inside the session's transaction.
+    The caller commits. Every row is assigned to `user_id`, whatever the payload said.
+
+    :param user_id: ID of the logged-in user.
+    :type user_id: int
+    :return: Number of rows written.
+    """
+    if not expenditures:
+        return 0
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for exp in expenditures:
+        writer.writerow([
+            exp.transaction_timestamp.isoformat(),
+            to_cents(exp.price),
+            exp.nature,
+            exp.is_shared,
+            user_id,
+            exp.category_id,
+            exp.payment_method_id,
+        ])
+    buffer.seek(0)
+
+    # Use the DBAPI connection behind the session, so COPY shares its transaction.
+    dbapi_connection = db.connection().connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {models.FactExpenditure.__tablename__} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    return len(expenditures)
@@ -3,6 +3,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
+from pool_metrics import TimedAsyncQueuePool, TimedQueuePool, instrument
+from metrics import instrument_queries
+
 load_dotenv()
 
 
@@ -22,6 +25,52 @@ DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NA
 if DATABASE_URL is None:
     raise ValueError("DATABASE_URL not found in .env file")
 
-engine = create_engine(DATABASE_URL)
+# One pool, shared by the API and the ETL. Tune it with these variables.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Server-side limit per statement, in milliseconds. 0 means no limit.
+# The ETL shares this pool, so leave room for its extract queries.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=TimedQueuePool,
+    connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"} if DB_STATEMENT_TIMEOUT_MS else {},
+    **POOL_OPTIONS,
+)
+instrument(engine)
+instrument_queries(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# Set DB_ASYNC=true to serve the CRUD/listing routes with asyncpg + AsyncSession
+# instead of sync sessions in the threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=TimedAsyncQueuePool,
+        connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}} if DB_STATEMENT_TIMEOUT_MS else {},
+        **POOL_OPTIONS,
+    )
+    instrument(async_engine.sync_engine)
+    instrument_queries(async_engine.sync_engine)
+    # Keep attributes loaded after commit: lazy loads can't happen outside `await`.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from cache import TTLCache
+
+# Safety net for changes made outside the API (e.g. straight in the database).
+DIMENSION_CACHE_TTL_SECONDS = int(os.getenv("DIMENSION_CACHE_TTL_SECONDS", "3600"))
+
+# Cached lists, by the name the routes use.
+DIMENSIONS = ("users", "categories", "payment_methods")
+
+
+@dataclass(frozen=True)
+class CachedList:
+    body: bytes
+    etag: str
+
+
+class DimensionCache:
+    """
+    Serialized dimension lists with a content-hash ETag.
+
+    Each dimension has a version number that the create/delete routes bump.
+    A list loaded while a write happened is not stored, so the cache never
+    holds data older than the last bump.
+    """
+    def __init__(self, ttl: float = DIMENSION_CACHE_TTL_SECONDS):
+        self._entries = TTLCache(maxsize=len(DIMENSIONS), ttl=ttl)
+        self._versions = {name: 0 for name in DIMENSIONS}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> tuple[CachedList | None, int]:
+        """
+        :return: The cached list (or `None`), and the version to pass to `put` after a reload.
+        """
+        with self._lock:
+            version = self._versions[name]
+        return self._entries.get((name, version)), version
+
+    def put(self, name: str, version: int, rows: list, schema) -> CachedList:
+        """
+        Serializes `rows` with `schema` and stores them, unless the dimension changed since `version`.
+        """
+        adapter = TypeAdapter(list[schema])
+        body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+        entry = CachedList(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        with self._lock:
+            if self._versions[name] == version:
+                self._entries.set((name, version), entry)
+        return entry
+
+    def bump(self, name: str):
+        """
+        Marks a dimension as changed. Call it after the write is committed.
+        """
+        with self._lock:
+            self._versions[name] += 1
+
+
+dimension_cache = DimensionCache()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the request's `If-None-Match` header covers `etag` (weak comparison).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def list_response(request: Request, entry: CachedList) -> Response:
+    """
+    The cached list, or an empty 304 if the client already has this version.
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -1,7 +1,7 @@
 import os
+import sys
 import random
 import pandas as pd
-from sqlalchemy import create_engine
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -13,9 +13,12 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5433")
 DB_NAME = os.getenv("DB_NAME")
 
-# Connection string
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
+# Reuse the backend's engine (and its pool settings), also when run as a plain script
+os.environ.setdefault("DB_HOST", DB_HOST)
+os.environ.setdefault("DB_PORT", DB_PORT)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import engine
+import partitions
 
 print("Connecting to database...")
 
@@ -71,7 +74,7 @@ for _ in range(50):
 
     # Determine price based on category
     low, high = price_logic.get(sub_cat, (20, 100))
-    price = round(random.uniform(low, high), 2)
+    price_cents = round(random.uniform(low, high) * 100)
 
     # Determine date (last 60 days)
     days_ago = random.randint(0, 60)
@@ -87,7 +90,7 @@ for _ in range(50):
     
     data.append({
         "transaction_timestamp": tx_date,
-        "price": price,
+        "price_cents": price_cents,
         "person_id": random.choice(person_ids),
         "category_id": cat_id,
         "payment_method_id": random.choice(method_ids),
@@ -99,11 +102,12 @@ for _ in range(50):
 df_new = pd.DataFrame(data)
 
 try:
+    partitions.ensure_partitions(engine, df_new["transaction_timestamp"])
     df_new.to_sql("fact_expenditures", engine, if_exists="append", index=False)
     print(f"Success! Inserted {len(df_new)} rows.")
 
     # 5. Show preview
     print("\nSample Data:")
-    print(df_new[["transaction_timestamp", "price", "category_id"]].head())
+    print(df_new[["transaction_timestamp", "price_cents", "category_id"]].head())
 except Exception as e:
     print(f"Insert Failed: {e}")
@@ -0,0 +1,183 @@
+"""
+Measurements of ETL runs: wall time, rows, bytes written, peak memory and extract size
+per stage, saved to the `etl_runs` table so runs can be compared with one another.
+"""
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+# How often memory is sampled while a stage runs.
+ETL_RSS_SAMPLE_SECONDS = float(os.getenv("ETL_RSS_SAMPLE_SECONDS", "0.05"))
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def peak_rss_bytes() -> int:
+    """
+    Highest resident memory of this process since it started.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident memory of this process right now. Falls back to the peak where `/proc` isn't available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+class RssSampler:
+    """
+    Samples resident memory on a background thread, keeping the highest value seen.
+
+    The process-wide peak (`ru_maxrss`) can't be reset, so it can't tell stages apart.
+    Only this process is measured: Hyper's own memory lives in the `hyperd` process.
+    """
+    def __init__(self, interval: float = ETL_RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, name="etl-rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+class PipelineStopped(Exception):
+    """
+    Raised by a stage that can't go on. Unlike a `return` out of `PipelineRun.stage`,
+    it gets the stage (and the tracker's) recorded as failed.
+    """
+
+
+class PipelineRun:
+    """
+    Measurements of one ETL run. `stage(name)` wraps a pipeline step; the step fills in
+    what only it knows (`rows`, `rows_deleted`, `bytes_written`) on the dict it gets.
+    """
+    def __init__(self, full_refresh: bool = False, tracker=None, hyper_path: str | None = None):
+        """
+        :param full_refresh: Whether a full rebuild was asked for.
+        :type full_refresh: bool
+        :param tracker: Optional `RefreshJob`; its stages get the same measurements.
+        :param hyper_path: Extract whose size is recorded after each stage.
+        :type hyper_path: str | None
+        """
+        self.tracker = tracker
+        self.hyper_path = hyper_path
+        self.job_id = getattr(tracker, "job_id", None)
+        self.full_refresh = full_refresh
+        self.mode = None # full | incremental, once known
+        self.status = "running"
+        self.started_at = _now()
+        self.finished_at = None
+        self.error = None
+        self.stages = []
+        self._start = time.perf_counter()
+        self._duration = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times one pipeline step and records memory and extract size around it.
+
+        :param name: Stage name (e.g. "extract").
+        :type name: str
+        """
+        metrics = {
+            "name": name, "status": "running", "duration_seconds": None,
+            "rows": None, "rows_deleted": None, "bytes_written": None,
+            "hyper_size_bytes": None, "peak_rss_bytes": None,
+        }
+        self.stages.append(metrics)
+        with self.tracker.stage(name) if self.tracker else nullcontext({}) as entry:
+            start = time.perf_counter()
+            sampler = RssSampler()
+            try:
+                with sampler:
+                    yield metrics
+            except Exception:
+                self._finish_stage(metrics, entry, "failed", start, sampler)
+                raise
+            self._finish_stage(metrics, entry, "succeeded", start, sampler)
+
+    def _finish_stage(self, metrics: dict, entry: dict, status: str, start: float, sampler: RssSampler):
+        metrics["status"] = status
+        metrics["duration_seconds"] = round(time.perf_counter() - start, 3)
+        metrics["peak_rss_bytes"] = sampler.peak
+        if self.hyper_path and os.path.exists(self.hyper_path):
+            metrics["hyper_size_bytes"] = os.path.getsize(self.hyper_path)
+        entry.update({k: v for k, v in metrics.items() if k not in ("name", "status", "duration_seconds")})
+        print(
+            f"Stage {metrics['name']} {status} in {metrics['duration_seconds']:.2f}s "
+            f"(rows: {metrics['rows']}, peak RSS: {metrics['peak_rss_bytes'] / (1024 * 1024):.0f} MB)"
+        )
+
+    def finish(self, succeeded: bool, error: str | None = None):
+        self.status = "succeeded" if succeeded else "failed"
+        if not succeeded:
+            self.error = error or "Pipeline stopped before finishing."
+        self.finished_at = _now()
+        self._duration = round(time.perf_counter() - self._start, 3)
+
+    def to_row(self) -> dict:
+        """
+        Column values for `models.EtlRun`.
+        """
+        sizes = [s["hyper_size_bytes"] for s in self.stages if s["hyper_size_bytes"] is not None]
+        peaks = [s["peak_rss_bytes"] for s in self.stages if s["peak_rss_bytes"] is not None]
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "mode": self.mode,
+            "full_refresh": self.full_refresh,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self._duration,
+            "hyper_size_bytes": sizes[-1] if sizes else None,
+            "peak_rss_bytes": max(peaks) if peaks else None,
+            "error": self.error,
+            "stages": [dict(s) for s in self.stages],
+        }
+
+
+def save_run(engine, run: PipelineRun):
+    """
+    Appends `run` to `etl_runs`. A failure here is printed, never raised: losing one
+    history row must not fail the pipeline.
+
+    :param engine: SQLAlchemy engine.
+    :param run: Finished run.
+    :type run: PipelineRun
+    """
+    import models
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(models.EtlRun.__table__.insert().values(**run.to_row()))
+    except Exception as e:
+        print(f"Could not save ETL run history: {e}")
@@ -1,76 +1,229 @@
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import text
 import os
+import sys
+import json
+from datetime import datetime, timedelta
 import pandas as pd
 import pantab
-from tableauhyperapi import TableName
-from etl.tableau_manager import TableauManager
+import pyarrow as pa
+from tableauhyperapi import HyperProcess, Telemetry, Connection, CreateMode, Inserter, SqlType, TableDefinition, TableName
+from etl.tableau_manager import get_manager
+from etl.instrumentation import PipelineRun, PipelineStopped, save_run
+import partitions
+
+# Where the extract (and its watermark) lives
+OUTPUT_DIR = "artifacts"
+HYPER_FILENAME = "expenditures.hyper"
+HYPER_TABLE = "Expenditures"
+
+# Publishing. An incremental run sends Tableau only a delta file (changed rows, deleted IDs)
+# and update actions keyed on `expenditure_id`. The whole extract is published (Overwrite)
+# after a full rebuild, whenever Tableau's copy may have missed a run, and at least every
+# TABLEAU_COMPACTION_HOURS, so the datasource is regularly rewritten from a clean file.
+TABLEAU_PROJECT = "Finance App 2026"
+DATASOURCE_NAME = os.path.splitext(HYPER_FILENAME)[0]
+DELTA_FILENAME = "expenditures.delta.hyper"
+DELETED_TABLE = "Deleted"
+TABLEAU_COMPACTION_HOURS = float(os.getenv("TABLEAU_COMPACTION_HOURS", "168"))
+
+# Rows committed slightly after we read the clock can carry an older `updated_at`.
+# Re-reading a small window on every run catches them; the upsert is idempotent.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# Text columns are forced to a string dtype so that a small batch where a column is
+# all NULL still lines up with the column types of the existing extract.
+TEXT_COLUMNS = ["nature", "full_name", "primary_category", "sub_category", "cost_type", "method_name", "institution"]
+
+# Prices are exact decimals in the extract. Bump EXTRACT_VERSION whenever the layout below
+# changes: an extract written with another version is rebuilt instead of updated.
+PRICE_DTYPE = pd.ArrowDtype(pa.decimal128(12, 2))
+EXTRACT_VERSION = 2
+
+# Streaming mode reads and writes this many rows at a time, so memory stays flat.
+ETL_CHUNK_SIZE = int(os.getenv("ETL_CHUNK_SIZE", "10000"))
+ETL_STREAMING = os.getenv("ETL_STREAMING", "true").lower() in ("1", "true", "yes")
+
+# Explicit layout of the extract, in the same order as the columns of EXPENDITURES_QUERY.
+# Types match what `pantab` infers for the DataFrame path, so both paths can update the same file.
+EXPENDITURES_TABLE = TableDefinition(TableName(HYPER_TABLE), [
+    TableDefinition.Column("expenditure_id", SqlType.big_int()),
+    TableDefinition.Column("transaction_timestamp", SqlType.timestamp()),
+    TableDefinition.Column("price", SqlType.numeric(12, 2)),
+    TableDefinition.Column("nature", SqlType.text()),
+    TableDefinition.Column("is_shared", SqlType.bool()),
+    TableDefinition.Column("full_name", SqlType.text()),
+    TableDefinition.Column("primary_category", SqlType.text()),
+    TableDefinition.Column("sub_category", SqlType.text()),
+    TableDefinition.Column("cost_type", SqlType.text()),
+    TableDefinition.Column("method_name", SqlType.text()),
+    TableDefinition.Column("institution", SqlType.text()),
+])
+
+EXPENDITURES_QUERY = """
+SELECT
+    f.expenditure_id,
+    f.transaction_timestamp AT TIME ZONE 'America/Sao_Paulo' AS transaction_timestamp,
+    (f.price_cents / 100.0)::NUMERIC(12, 2) AS price,
+    f.nature,
+    f.is_shared,
+    p.full_name,
+    c.primary_category,
+    c.sub_category,
+    c.cost_type,
+    pm.method_name,
+    pm.institution
+FROM fact_expenditures f
+JOIN dim_user p ON f.user_id = p.user_id
+JOIN dim_category c ON f.category_id = c.category_id
+JOIN dim_payment_method pm ON f.payment_method_id = pm.payment_method_id
+"""
 
 
 # Helper functions
 def get_db_connection():
     """
-    Creates the connection string for SQLAlchemy.
+    Returns the backend's shared SQLAlchemy engine, so the ETL draws from the same
+    (configured and monitored) connection pool as the API instead of opening its own.
     """
     try:
-        user = os.getenv("DB_USER")
-        password = os.getenv("DB_PASSWORD")
-        host = os.getenv("DB_HOST")
-        port = os.getenv("DB_PORT")
-        dbname = os.getenv("DB_NAME")
-
         # Validate inputs to avoid errors later on
-        if not all([user, password, host, port, dbname]):
+        if not all(os.getenv(var) for var in ("DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME")):
             print("Error: Missing DB credentials in .env")
             return None
-        
-        url = f"postgresql://{user}:{password}@{host}:{port}/{dbname}"
-        return create_engine(url)
+
+        from database import engine
+        return engine
     except Exception as e:
         print(f"Configuration error: {e}")
         return None
     
-def extract_data():
+def extract_data(engine=None, since: datetime | None = None):
     """
     Step 1: Extract data from Postgres.
+
+    :param engine: SQLAlchemy engine. The shared one is used if not given.
+    :param since: If given, only rows written after this moment are extracted.
+    :type since: datetime | None
     """
     print("Connecting to Database...")
-    engine = get_db_connection()
+    engine = engine or get_db_connection()
     if not engine: return None
 
-    # Simple query to test the join logic
-    query = """
-    SELECT
-        f.expenditure_id,
-        f.transaction_timestamp AT TIME ZONE 'America/Sao_Paulo' AS transaction_timestamp,
-        f.price,
-        f.nature,
-        f.is_shared,
-        p.full_name,
-        c.primary_category,
-        c.sub_category,
-        c.cost_type,
-        pm.method_name,
-        pm.institution
-    FROM fact_expenditures f
-    JOIN dim_user p ON f.user_id = p.user_id
-    JOIN dim_category c ON f.category_id = c.category_id
-    JOIN dim_payment_method pm ON f.payment_method_id = pm.payment_method_id;    
-    """
+    query = EXPENDITURES_QUERY
+    params = {}
+    if since is not None:
+        query += " WHERE f.updated_at > :since"
+        params["since"] = since
 
     try:
-        df = pd.read_sql(query, engine)
-        if df.empty:
+        df = pd.read_sql(text(query), engine, params=params)
+        if df.empty and since is None:
             print("Connection successful, but no data found.")
             return None
+        df[TEXT_COLUMNS] = df[TEXT_COLUMNS].astype("string")
+        df["price"] = df["price"].astype(PRICE_DTYPE)
         print(f"Extracted {len(df)} rows.")
         return df
     except Exception as e:
         print(f"Database Extraction Failed: {e}")
         return None
 
+def extract_deleted_ids(engine, since: datetime):
+    """
+    Returns the IDs of expenditures deleted after `since`.
+
+    :param engine: SQLAlchemy engine.
+    :param since: Only deletions logged after this moment are returned.
+    :type since: datetime
+    """
+    query = text("SELECT expenditure_id FROM expenditure_deletions WHERE deleted_at > :since")
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(query, {"since": since})]
+
+def get_db_time(engine):
+    """
+    Reads the current time from the database clock, which is the one `updated_at` uses.
+    """
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT now()")).scalar()
+
+# Watermark helpers
+def get_watermark_path(file_path: str) -> str:
+    """
+    The watermark sits next to the extract it describes.
+    """
+    return os.path.splitext(file_path)[0] + ".watermark.json"
+
+def load_watermark(file_path: str):
+    """
+    Returns the moment the extract at `file_path` was last synced,
+    or `None` if there is no usable extract/watermark pair.
+
+    :param file_path: Path to the `.hyper` file.
+    :type file_path: str
+    """
+    watermark_path = get_watermark_path(file_path)
+    if not os.path.exists(file_path) or not os.path.exists(watermark_path):
+        return None
+    try:
+        with open(watermark_path) as f:
+            watermark = json.load(f)
+        if watermark.get("version") != EXTRACT_VERSION:
+            print("Extract layout changed since the last run, rebuilding it.")
+            return None
+        return datetime.fromisoformat(watermark["synced_at"])
+    except (ValueError, KeyError, OSError) as e:
+        print(f"Ignoring unreadable watermark: {e}")
+        return None
+
+def save_watermark(file_path: str, synced_at: datetime):
+    """
+    Persists the sync point of the extract at `file_path`.
+    """
+    with open(get_watermark_path(file_path), "w") as f:
+        json.dump({"synced_at": synced_at.isoformat(), "version": EXTRACT_VERSION}, f)
+
+# Publish state helpers
+def get_publish_state_path(file_path: str) -> str:
+    """
+    What was last published from the extract at `file_path`, next to it.
+    """
+    return os.path.splitext(file_path)[0] + ".published.json"
+
+def load_publish_state(file_path: str) -> dict:
+    """
+    Returns `{"synced_at": ..., "full_published_at": ...}` (ISO strings) for the extract
+    at `file_path`, or an empty dict if it was never published from here.
+    """
+    try:
+        with open(get_publish_state_path(file_path)) as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return {}
+
+def save_publish_state(file_path: str, synced_at: datetime, full_published_at: str):
+    """
+    Records that Tableau holds the extract as of `synced_at`.
+    """
+    with open(get_publish_state_path(file_path), "w") as f:
+        json.dump({"synced_at": synced_at.isoformat(), "full_published_at": full_published_at}, f)
+
+def can_publish_delta(publish_state: dict, watermark: datetime | None) -> bool:
+    """
+    A delta is enough only if Tableau has every change up to the watermark this run started
+    from, and the last full publish is recent enough.
+    """
+    if watermark is None or publish_state.get("synced_at") != watermark.isoformat():
+        return False
+    try:
+        full_published_at = datetime.fromisoformat(publish_state["full_published_at"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return datetime.now() - full_published_at < timedelta(hours=TABLEAU_COMPACTION_HOURS)
+
     # 2. Hyper Logic
-def generate_hyper_file(df, filename="expenditures.hyper"):
+def generate_hyper_file(df, filename=HYPER_FILENAME):
     """
     Step 2: Testing Hyper File Generation
     
@@ -80,7 +233,7 @@ def generate_hyper_file(df, filename="expenditures.hyper"):
     print("Generating Hyper file...")
 
     # Define a clean subfolder for output
-    output_dir = "artifacts"
+    output_dir = OUTPUT_DIR
 
     # Create the folder if it does not exist
     os.makedirs(output_dir, exist_ok=True)
@@ -89,7 +242,7 @@ def generate_hyper_file(df, filename="expenditures.hyper"):
     file_path = os.path.join(output_dir, filename)
     
     try:
-        pantab.frame_to_hyper(df, file_path, table="Expenditures")
+        pantab.frame_to_hyper(df, file_path, table=HYPER_TABLE)
 
         # Verify the file was actually created
         if os.path.exists(file_path):
@@ -104,35 +257,315 @@ def generate_hyper_file(df, filename="expenditures.hyper"):
         print(f"Hyper Generation Failed: {e}")
         return None
 
+def _delete_ids_from_hyper(connection, ids):
+    """
+    Deletes the given expenditure IDs from the extract table.
+    """
+    table = TableName(HYPER_TABLE)
+    ids = sorted(set(ids))
+    # Keep the statements small; IDs are ints so inlining them is safe.
+    for i in range(0, len(ids), 1000):
+        id_list = ", ".join(str(int(x)) for x in ids[i:i + 1000])
+        connection.execute_command(f"DELETE FROM {table} WHERE expenditure_id IN ({id_list})")
+
+def upsert_hyper_file(df, deleted_ids, filename=HYPER_FILENAME):
+    """
+    Step 2 (incremental): Applies changed and deleted rows to the existing Hyper file.
+
+    Changed rows are deleted and re-inserted, so an edit and an insert look the same.
+
+    :param df: DataFrame with new/changed rows.
+    :param deleted_ids: IDs of expenditures removed from the database.
+    :param filename: Filename of the existing `.hyper` file.
+    """
+    file_path = os.path.join(OUTPUT_DIR, filename)
+    stale_ids = set(df["expenditure_id"].tolist()) | set(deleted_ids)
+    print(f"Upserting {len(df)} rows and removing {len(deleted_ids)} deleted rows...")
+
+    try:
+        if stale_ids:
+            with HyperProcess(telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU) as hyper:
+                with Connection(hyper.endpoint, file_path) as connection:
+                    _delete_ids_from_hyper(connection, stale_ids)
+
+        if not df.empty:
+            pantab.frame_to_hyper(df, file_path, table=HYPER_TABLE, table_mode="a")
+        return file_path
+    except Exception as e:
+        print(f"Hyper Upsert Failed: {e}")
+        return None
+
+def stream_to_hyper(engine, since: datetime | None = None, deleted_ids=(), filename=HYPER_FILENAME, chunk_size=ETL_CHUNK_SIZE, changed_ids=None, stats=None):
+    """
+    Steps 1 + 2 (streaming): Reads the query through a server-side cursor and writes
+    each chunk straight into the Hyper file, without building a DataFrame.
+
+    Without `since`, the extract is rebuilt into a temporary file that replaces the old one at the end.
+    With `since`, changed rows are upserted into the existing extract and `deleted_ids` are removed.
+
+    :param engine: SQLAlchemy engine.
+    :param since: If given, only rows written after this moment are applied.
+    :type since: datetime | None
+    :param deleted_ids: IDs of expenditures removed from the database (incremental only).
+    :param filename: Filename for the `.hyper` file.
+    :param chunk_size: Number of rows fetched and inserted at a time.
+    :type chunk_size: int
+    :param changed_ids: If given, a list the IDs of the upserted rows are appended to (incremental only).
+    :type changed_ids: list | None
+    :param stats: If given, a dict that receives the number of `rows` written.
+    :type stats: dict | None
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    file_path = os.path.join(OUTPUT_DIR, filename)
+    incremental = since is not None
+    target_path = file_path if incremental else file_path + ".tmp"
+
+    query = EXPENDITURES_QUERY
+    params = {}
+    if incremental:
+        query += " WHERE f.updated_at > :since"
+        params["since"] = since
+
+    print(f"Streaming expenditures into Hyper ({chunk_size} rows per chunk)...")
+    total_rows = 0
+    try:
+        create_mode = CreateMode.NONE if incremental else CreateMode.CREATE_AND_REPLACE
+        with HyperProcess(telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU) as hyper:
+            with Connection(hyper.endpoint, target_path, create_mode) as connection:
+                if incremental:
+                    _delete_ids_from_hyper(connection, deleted_ids)
+                else:
+                    connection.catalog.create_table(EXPENDITURES_TABLE)
+
+                # `yield_per` turns on a server-side cursor, so Postgres hands rows over one chunk at a time.
+                with engine.connect() as conn:
+                    result = conn.execution_options(yield_per=chunk_size).execute(text(query), params)
+                    for chunk in result.partitions():
+                        if incremental:
+                            # Edited rows are already in the extract; drop the old version first.
+                            chunk_ids = [row[0] for row in chunk]
+                            _delete_ids_from_hyper(connection, chunk_ids)
+                            if changed_ids is not None:
+                                changed_ids.extend(chunk_ids)
+                        with Inserter(connection, EXPENDITURES_TABLE) as inserter:
+                            inserter.add_rows(chunk)
+                            inserter.execute()
+                        total_rows += len(chunk)
+                        if stats is not None:
+                            stats["rows"] = total_rows
+
+        if not incremental:
+            if total_rows == 0:
+                print("Connection successful, but no data found.")
+                os.remove(target_path)
+                return None
+            os.replace(target_path, file_path)
+
+        size_mb = os.path.getsize(file_path) / (1024 * 1024)
+        print(f"Success! Wrote {total_rows} rows to '{file_path}' ({size_mb:.2f} MB).")
+        return file_path
+    except Exception as e:
+        print(f"Hyper Streaming Failed: {e}")
+        if not incremental and os.path.exists(target_path):
+            os.remove(target_path)
+        return None
+
+def build_delta_hyper(source_path: str, changed_ids, deleted_ids, filename=DELTA_FILENAME):
+    """
+    Step 2b (incremental): Writes the changes of this run to a small Hyper file, for
+    `delta_actions` to apply to the published datasource.
+
+    It holds an `Expenditures` table (same layout as the extract) with the changed rows,
+    copied from the updated extract, and a `Deleted` table with the deleted IDs.
+
+    :param source_path: Path to the updated extract.
+    :type source_path: str
+    :param changed_ids: IDs of new or edited expenditures.
+    :param deleted_ids: IDs of expenditures removed from the database.
+    :param filename: Filename for the delta `.hyper` file.
+    :return: Path to the delta file, or `None` if there are no changes.
+    """
+    changed_ids = sorted(set(changed_ids))
+    deleted_ids = sorted(set(deleted_ids) - set(changed_ids))
+    if not changed_ids and not deleted_ids:
+        return None
+
+    file_path = os.path.join(OUTPUT_DIR, filename)
+    source_table = TableName("extract", "public", HYPER_TABLE)
+    delta_table = TableDefinition(TableName("delta", "public", HYPER_TABLE), EXPENDITURES_TABLE.columns)
+    deleted_table = TableDefinition(TableName("delta", "public", DELETED_TABLE), [
+        TableDefinition.Column("expenditure_id", SqlType.big_int()),
+    ])
+
+    # A delta left over from a failed publish is stale: start from an empty file.
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+    with HyperProcess(telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU) as hyper:
+        with Connection(hyper.endpoint) as connection:
+            connection.catalog.create_database(file_path)
+            connection.catalog.attach_database(file_path, alias="delta")
+            connection.catalog.attach_database(source_path, alias="extract")
+            connection.catalog.create_table(delta_table)
+            connection.catalog.create_table(deleted_table)
+
+            # IDs are ints so inlining them is safe.
+            for i in range(0, len(changed_ids), 1000):
+                id_list = ", ".join(str(int(x)) for x in changed_ids[i:i + 1000])
+                connection.execute_command(
+                    f"INSERT INTO {delta_table.table_name} SELECT * FROM {source_table} WHERE expenditure_id IN ({id_list})"
+                )
+            with Inserter(connection, deleted_table) as inserter:
+                inserter.add_rows([int(x)] for x in deleted_ids)
+                inserter.execute()
+
+    size_kb = os.path.getsize(file_path) / 1024
+    print(f"Delta: {len(changed_ids)} changed and {len(deleted_ids)} deleted rows in '{file_path}' ({size_kb:.0f} KB).")
+    return file_path
+
+def delta_actions():
+    """
+    Update actions for a delta from `build_delta_hyper`: drop the deleted rows, then
+    insert or replace the changed ones, matched on `expenditure_id`.
+    """
+    condition = {"op": "eq", "target-col": "expenditure_id", "source-col": "expenditure_id"}
+    target = {"target-schema": "public", "target-table": HYPER_TABLE}
+    return [
+        {"action": "delete", **target, "source-schema": "public", "source-table": DELETED_TABLE, "condition": condition},
+        {"action": "upsert", **target, "source-schema": "public", "source-table": HYPER_TABLE, "condition": condition},
+    ]
+
 # Main pipeline function - called by API #
 # Define the function
-def run_pipeline():
+def run_pipeline(full_refresh: bool = False, tracker=None, streaming: bool = ETL_STREAMING):
     """
     Runs the entire ETL pipeline sequence.
+
+    By default only rows changed since the last run are applied to the existing extract,
+    and only those changes are sent to Tableau (see `build_delta_hyper`).
+    A full rebuild happens when asked for, or when there is no extract/watermark yet.
+
+    :param full_refresh: Rebuild the extract from scratch.
+    :type full_refresh: bool
+    :param tracker: Optional object with a `stage(name)` context manager (e.g. a `RefreshJob`)
+        used to report progress and timings. Every run is also measured and saved to `etl_runs`.
+    :param streaming: Stream rows from Postgres into Hyper in chunks instead of loading a DataFrame.
+        In this mode the rows are read during the "transform" stage.
+    :type streaming: bool
+    :return: `True` if the extract (or its changes) was published, `None` if the pipeline stopped early.
+    """
+    hyper_path = os.path.join(OUTPUT_DIR, HYPER_FILENAME)
+    run = PipelineRun(full_refresh=full_refresh, tracker=tracker, hyper_path=hyper_path)
+    engine = get_db_connection()
+    try:
+        result = _run_stages(run, engine, hyper_path, full_refresh, streaming)
+    except PipelineStopped as e:
+        print(f"Pipeline stopped: {e}")
+        run.finish(False, error=str(e))
+        result = None
+    except Exception as e:
+        run.finish(False, error=str(e))
+        raise
+    else:
+        run.finish(bool(result))
+    finally:
+        if engine:
+            save_run(engine, run)
+    return result
+
+def _run_stages(run: PipelineRun, engine, hyper_path: str, full_refresh: bool, streaming: bool):
+    """
+    The stages of `run_pipeline`, each measured by `run`. A stage that can't go on
+    raises `PipelineStopped`, so it is recorded as failed.
     """
     # 1. Extract
-    df = extract_data()
-    if df is None:
-        print("Pipeline stopped: Extraction failed.")
-        return
-    
+    with run.stage("extract") as metrics:
+        if not engine:
+            raise PipelineStopped("Extraction failed: no database connection.")
+
+        watermark = None if full_refresh else load_watermark(hyper_path)
+        # Read the clock before extracting, so anything written during the run is picked up next time.
+        synced_at = get_db_time(engine)
+        # Runs regularly, so it also creates upcoming partitions ahead of the API's inserts.
+        partitions.ensure_upcoming(engine)
+
+        since = None
+        deleted_ids = None
+        run.mode = "full" if watermark is None else "incremental"
+        if watermark is None:
+            print("Running full extraction...")
+        else:
+            since = watermark - WATERMARK_OVERLAP
+            print(f"Running incremental extraction (changes since {since})...")
+            deleted_ids = extract_deleted_ids(engine, since)
+            metrics["rows_deleted"] = len(deleted_ids)
+
+        df = None
+        if not streaming:
+            df = extract_data(engine, since=since)
+            if df is None:
+                raise PipelineStopped("Extraction failed.")
+            metrics["rows"] = len(df)
+
     # 2. Transform / Generate File
-    hyper_file = generate_hyper_file(df)
-    if not hyper_file:
-        print("Pipeline stopped: Hyper file generation failed.")
-        return
-    
+    with run.stage("transform") as metrics:
+        changed_ids = []
+        if streaming:
+            hyper_file = stream_to_hyper(engine, since=since, deleted_ids=deleted_ids or (), changed_ids=changed_ids, stats=metrics)
+        elif deleted_ids is None:
+            hyper_file = generate_hyper_file(df)
+        else:
+            hyper_file = upsert_hyper_file(df, deleted_ids)
+            changed_ids = df["expenditure_id"].tolist()
+
+        if not hyper_file:
+            raise PipelineStopped("Hyper file generation failed.")
+        save_watermark(hyper_file, synced_at)
+
+        publish_state = load_publish_state(hyper_file)
+        publish_delta = can_publish_delta(publish_state, watermark)
+        delta_file = build_delta_hyper(hyper_file, changed_ids, deleted_ids) if publish_delta else None
+
+        if not streaming:
+            metrics["rows"] = len(df)
+        # What this run writes for Tableau: the delta, or else the whole extract (on a full rebuild).
+        if delta_file:
+            metrics["bytes_written"] = os.path.getsize(delta_file)
+        elif run.mode == "full":
+            metrics["bytes_written"] = os.path.getsize(hyper_file)
+
     # 3. Publish
-    try:
-        print("Publishing to Tableau...")
-        manager = TableauManager()
-        manager.publish_hyper(hyper_file, target_project_name="Finance App 2026")
-        print("ETL Finished Successfully!")
+    with run.stage("publish") as metrics:
+        try:
+            print("Publishing to Tableau...")
+            manager = get_manager()
+            full_published_at = publish_state.get("full_published_at")
+            metrics["bytes_written"] = 0
+            if publish_delta and delta_file is None:
+                print("No changes to publish.")
+            elif publish_delta:
+                try:
+                    manager.update_hyper_data(delta_file, delta_actions(), TABLEAU_PROJECT, DATASOURCE_NAME)
+                    metrics["bytes_written"] = os.path.getsize(delta_file)
+                    os.remove(delta_file)
+                except LookupError as e:
+                    print(f"{e}, publishing the whole extract instead.")
+                    publish_delta = False
+            if not publish_delta:
+                manager.publish_hyper(hyper_file, target_project_name=TABLEAU_PROJECT, datasource_name=DATASOURCE_NAME)
+                full_published_at = datetime.now().isoformat()
+                metrics["bytes_written"] = os.path.getsize(hyper_file)
+            # Only now is Tableau known to be in sync; if anything above failed, the next
+            # run sees a stale `synced_at` and publishes the whole extract.
+            save_publish_state(hyper_file, synced_at, full_published_at)
+            print("ETL Finished Successfully!")
 
-    except Exception as e:
-        print(f"Publishing failed: {e}")
-        # Raise the error so the API knows it failed (trigger 500 error)
-        raise e
+        except Exception as e:
+            print(f"Publishing failed: {e}")
+            # Raise the error so the caller knows it failed
+            raise e
+
+    return True
     
 if __name__ == "__main__":
-    run_pipeline()
+    run_pipeline(full_refresh="--full" in sys.argv)
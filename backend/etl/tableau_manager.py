@@ -1,5 +1,17 @@
 import tableauserverclient as TSC
 import os
+import threading
+import time
+import uuid
+
+# Extracts at least this big are published as an asynchronous job that we poll, instead of
+# one request held open until Tableau is done (which can time out). Files of 64 MB and
+# more are also uploaded in chunks, by `tableauserverclient`.
+TABLEAU_ASYNC_PUBLISH_MB = float(os.getenv("TABLEAU_ASYNC_PUBLISH_MB", "16"))
+# Give up waiting on a publish job after this long.
+TABLEAU_PUBLISH_TIMEOUT_SECONDS = float(os.getenv("TABLEAU_PUBLISH_TIMEOUT_SECONDS", "1800"))
+# Seconds between polls of a publish job; doubles up to 30s.
+TABLEAU_JOB_POLL_SECONDS = float(os.getenv("TABLEAU_JOB_POLL_SECONDS", "2"))
 
 class TableauManager:
     def __init__(self):
@@ -15,13 +27,19 @@ class TableauManager:
         self.server = None
         self.auth = None
 
+        # Resolved IDs, so repeat publishes skip the lookups.
+        self._project_ids = {}
+        self._datasource_ids = {}
+        # One publish at a time per manager (the session and the caches are shared).
+        self._lock = threading.Lock()
+
     def connect(self):
         """
         Establishes the connection to Tableau Cloud.
         """
         if not all([self.server_url, self.site_name, self.token_name, self.token_value]):
             raise ValueError("Missing Tableau credentials in .env")
-        
+
         self.auth = TSC.PersonalAccessTokenAuth(
             token_name=self.token_name,
             personal_access_token=self.token_value,
@@ -33,62 +51,205 @@ class TableauManager:
         self.server.auth.sign_in(self.auth)
         print(f"Logged into Tableau as {self.site_name}")
 
+    def ensure_signed_in(self):
+        """
+        Signs in unless this manager already holds a session.
+        """
+        if not self.server or not self.server.auth_token:
+            self.connect()
+
+    def _with_session(self, action):
+        """
+        Runs `action()` on the current session. If Tableau rejects the session
+        (expired or revoked token), signs in again and retries once.
+        """
+        self.ensure_signed_in()
+        try:
+            return action()
+        except (TSC.NotSignedInError, TSC.ServerResponseError) as e:
+            if isinstance(e, TSC.ServerResponseError) and not str(e.code).startswith("401"):
+                raise
+            print("Tableau session expired, signing in again...")
+            self.connect()
+            return action()
+
+    @staticmethod
+    def _name_filter(name: str, project_name: str | None = None) -> TSC.RequestOptions:
+        # Filtered on the server: one small response instead of paging through the whole site.
+        options = TSC.RequestOptions()
+        options.filter.add(TSC.Filter(TSC.RequestOptions.Field.Name, TSC.RequestOptions.Operator.Equals, name))
+        if project_name is not None:
+            options.filter.add(TSC.Filter(TSC.RequestOptions.Field.ProjectName, TSC.RequestOptions.Operator.Equals, project_name))
+        return options
+
     def get_or_create_project(self, project_name: str):
         """
         The logic:
-        1. Checks if `project_name` exists.
-        2. If yes, returns its ID.
+        1. Returns the cached ID, if `project_name` was resolved before.
+        2. Looks the project up by name on the server; if it exists, returns its ID.
         3. If no, creates it and returns the new ID.
-        
+
         :param project_name: Name of the project
         :type project_name: str
         """
+        if project_name in self._project_ids:
+            return self._project_ids[project_name]
 
-        # Get all projects on the site
-        all_projects, _ = self.server.projects.get()
-
-        # Look for a match
-        existing_project = next((p for p in all_projects if p.name == project_name), None)
+        matches, _ = self.server.projects.get(self._name_filter(project_name))
 
-        if existing_project:
+        if matches:
             print(f"Found existing project: {project_name}")
-            return existing_project.id
+            project_id = matches[0].id
         else:
             print(f"Project {project_name} not found. Creating it...")
             new_project = TSC.ProjectItem(name=project_name)
             # Create returns the project item including the new ID
-            new_project = self.server.projects.create(new_project)
+            project_id = self.server.projects.create(new_project).id
             print(f"Successfully created project {project_name}")
-            return new_project.id
-        
-    def publish_hyper(self, hyper_file_path :str, target_project_name:str="default"):
+
+        self._project_ids[project_name] = project_id
+        return project_id
+
+    def get_datasource_id(self, datasource_name: str, project_name: str):
+        """
+        ID of a published datasource, or `None` if there is none by that name in the project.
+
+        :param datasource_name: Name of the datasource
+        :type datasource_name: str
+        :param project_name: Name of its project
+        :type project_name: str
+        """
+        key = (project_name, datasource_name)
+        if key not in self._datasource_ids:
+            matches, _ = self._with_session(
+                lambda: self.server.datasources.get(self._name_filter(datasource_name, project_name))
+            )
+            if not matches:
+                return None
+            self._datasource_ids[key] = matches[0].id
+        return self._datasource_ids[key]
+
+    def wait_for_job(self, job, timeout: float = TABLEAU_PUBLISH_TIMEOUT_SECONDS):
         """
-        Docstring for publish_hyper
-        
+        Polls a Tableau job until it finishes, printing its progress.
+
+        :param job: `JobItem` returned by an `as_job` call.
+        :param timeout: Seconds to wait before giving up.
+        :type timeout: float
+        :return: The finished `JobItem`.
+        """
+        deadline = time.monotonic() + timeout
+        delay = TABLEAU_JOB_POLL_SECONDS
+        last_progress = None
+        while True:
+            job = self._with_session(lambda: self.server.jobs.get_by_id(job.id))
+            if job.progress != last_progress:
+                print(f"Job {job.id}: {job.progress or 0}%")
+                last_progress = job.progress
+            if job.completed_at is not None:
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Tableau job {job.id} still running after {timeout:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+        if job.finish_code != TSC.JobItem.FinishCode.Success:
+            raise RuntimeError(f"Tableau job {job.id} failed (finish code {job.finish_code}): {job.notes}")
+        return job
+
+    def publish_hyper(self, hyper_file_path :str, target_project_name:str="default", datasource_name: str | None = None):
+        """
+        Publishes the extract, overwriting the datasource of the same name.
+
+        Large files go up as an async job (see `TABLEAU_ASYNC_PUBLISH_MB`), polled until done.
+
         :param hyper_file_path: Path to `hyper` file.
         :type hyper_file_path: str
-        :param targer_project_name: Project Name
-        :type targer_project_name: str
+        :param target_project_name: Project Name
+        :type target_project_name: str
+        :param datasource_name: Datasource name; defaults to the file name without extension.
+        :type datasource_name: str | None
+        :return: ID of the published datasource.
+        :rtype: str
         """
+        datasource_name = datasource_name or os.path.splitext(os.path.basename(hyper_file_path))[0]
+        size_mb = os.path.getsize(hyper_file_path) / (1024 * 1024)
+        as_job = size_mb >= TABLEAU_ASYNC_PUBLISH_MB
+
         try:
-            # 1. Sign in (if not already)
-            if not self.server or not self.server.auth_token:
-                self.connect()
-            
-            # 2. Get the Project ID (Creating it if necessary)
-            project_id = self.get_or_create_project(target_project_name)
-
-            # 3. Publish
-            print(f"Uploading {hyper_file_path}...")
-            datasource = TSC.DatasourceItem(project_id)
-
-            published_item = self.server.datasources.publish(
-                datasource,
-                hyper_file_path,
-                "Overwrite"
-            )
-            print(f"Success! Datasource {published_item.name} is live.")
-            print(f"ID: {published_item.id}")
+            with self._lock:
+                # 1. Sign in (if not already), 2. Get the Project ID (Creating it if necessary)
+                project_id = self._with_session(lambda: self.get_or_create_project(target_project_name))
+
+                # 3. Publish
+                print(f"Uploading {hyper_file_path} ({size_mb:.1f} MB{', as a job' if as_job else ''})...")
+                datasource = TSC.DatasourceItem(project_id, name=datasource_name)
+                published = self._with_session(lambda: self.server.datasources.publish(
+                    datasource,
+                    hyper_file_path,
+                    TSC.Server.PublishMode.Overwrite,
+                    as_job=as_job,
+                ))
+
+                if as_job:
+                    job = self.wait_for_job(published)
+                    datasource_id = job.datasource_id or self.get_datasource_id(datasource_name, target_project_name)
+                else:
+                    datasource_id = published.id
+                self._datasource_ids[(target_project_name, datasource_name)] = datasource_id
+
+            print(f"Success! Datasource {datasource_name} is live.")
+            print(f"ID: {datasource_id}")
+            return datasource_id
         except Exception as e:
             print(f"Publishing failed: {e}")
-            raise e
\ No newline at end of file
+            raise e
+
+    def update_hyper_data(self, payload_path: str, actions: list[dict], target_project_name: str, datasource_name: str):
+        """
+        Applies `actions` (Hyper update API: insert/upsert/delete...) to the published datasource,
+        with `payload_path` holding their source tables. Only the delta file is uploaded.
+
+        The request ID stays the same on the retry after a re-sign-in, so Tableau won't apply it twice.
+
+        :param payload_path: Path to the delta `hyper` file.
+        :type payload_path: str
+        :param actions: Actions, in order.
+        :type actions: list[dict]
+        :param target_project_name: Project Name
+        :type target_project_name: str
+        :param datasource_name: Name of the datasource to update.
+        :type datasource_name: str
+        :return: ID of the updated datasource.
+        :rtype: str
+        :raises LookupError: If the datasource isn't published yet.
+        """
+        request_id = uuid.uuid4().hex
+        size_mb = os.path.getsize(payload_path) / (1024 * 1024)
+        with self._lock:
+            datasource_id = self.get_datasource_id(datasource_name, target_project_name)
+            if datasource_id is None:
+                raise LookupError(f"Datasource {datasource_name} not found in project {target_project_name}")
+
+            print(f"Uploading changes {payload_path} ({size_mb:.1f} MB, {len(actions)} actions)...")
+            job = self._with_session(lambda: self.server.datasources.update_hyper_data(
+                datasource_id, request_id=request_id, actions=actions, payload=payload_path,
+            ))
+            self.wait_for_job(job)
+        print(f"Success! Datasource {datasource_name} is up to date.")
+        return datasource_id
+
+
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+def get_manager() -> TableauManager:
+    """
+    The process-wide manager: its signed-in session and resolved IDs carry over
+    from one pipeline run to the next.
+    """
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = TableauManager()
+        return _shared_manager
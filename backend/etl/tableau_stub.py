@@ -0,0 +1,291 @@
+"""
+Minimal stand-in for the Tableau REST API, enough for `TableauManager` to sign in,
+resolve projects and datasources, publish (single request, chunked upload, async job)
+and update a datasource's data with Hyper update actions.
+
+Run it and point the ETL at it:
+
+    python -m etl.tableau_stub --port 8765 [--token-ttl 60] [--job-polls 3]
+    TABLEAU_SERVER_URL=http://localhost:8765 TABLEAU_SITENAME=stub \\
+    TABLEAU_TOKEN_NAME=dev TABLEAU_TOKEN_VALUE=dev python -m etl.main
+
+State lives in memory; uploaded files are counted, not kept. Update actions are recorded
+per datasource, but not applied.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import quoteattr
+
+API_VERSION = "3.19"
+SITE_ID = "stub-site-id"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _response(body: str) -> bytes:
+    return f'<?xml version="1.0" encoding="UTF-8"?><tsResponse xmlns="http://tableau.com/api">{body}</tsResponse>'.encode()
+
+
+def _pagination(count: int) -> str:
+    return f'<pagination pageNumber="1" pageSize="100" totalAvailable="{count}"/>'
+
+
+def _filters(query: dict) -> dict:
+    """
+    Parses `filter=name:eq:Foo,projectName:eq:Bar` into {"name": "Foo", "projectName": "Bar"}.
+    """
+    filters = {}
+    for expression in query.get("filter", [""])[0].split(","):
+        parts = expression.split(":", 2)
+        if len(parts) == 3 and parts[1] == "eq":
+            filters[parts[0]] = unquote(parts[2])
+    return filters
+
+
+class StubState:
+    def __init__(self, token_ttl: float, job_polls: int):
+        self.lock = threading.Lock()
+        self.token_ttl = token_ttl
+        self.job_polls = job_polls
+        self.tokens = {}
+        self.projects = {}
+        self.datasources = {}
+        self.uploads = {}
+        self.jobs = {}
+        # Update requests received, per datasource ID: [{"request_id", "actions", "upload_bytes"}].
+        self.updates = {}
+        # Request counts per route, to check what a client really did.
+        self.calls = {}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state: StubState
+
+    def log_message(self, format, *args):
+        print(f"[tableau-stub] {self.command} {self.path} -> {args[1] if len(args) > 1 else ''}")
+
+    # --- Plumbing ---
+
+    def _send(self, status: int, body: str = ""):
+        payload = _response(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, code: str, summary: str):
+        self._send(status, f'<error code="{code}"><summary>{summary}</summary><detail>{summary}</detail></error>')
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _authorized(self) -> bool:
+        token = self.headers.get("X-Tableau-Auth")
+        with self.state.lock:
+            expires_at = self.state.tokens.get(token)
+        if expires_at is None or expires_at < time.monotonic():
+            self._error(401, "401002", "Unauthorized Access")
+            return False
+        return True
+
+    def _route(self, method: str):
+        url = urlparse(self.path)
+        path = re.sub(r"^/api/[\d.]+", "", url.path)
+        query = parse_qs(url.query)
+        key = f"{method} " + re.sub(r"/[0-9a-f-]{36}", "/{id}", path)
+        with self.state.lock:
+            self.state.calls[key] = self.state.calls.get(key, 0) + 1
+        return path, query
+
+    # --- Verbs ---
+
+    def do_GET(self):
+        path, query = self._route("GET")
+        if path == "/serverInfo":
+            return self._send(200, f'<serverInfo><productVersion build="stub">2024.1</productVersion><restApiVersion>{API_VERSION}</restApiVersion></serverInfo>')
+        if not self._authorized():
+            return
+        filters = _filters(query)
+
+        if path == f"/sites/{SITE_ID}/projects":
+            with self.state.lock:
+                projects = [p for p in self.state.projects.values() if filters.get("name", p["name"]) == p["name"]]
+            items = "".join(f'<project id="{p["id"]}" name={quoteattr(p["name"])} contentPermissions="ManagedByOwner"/>' for p in projects)
+            return self._send(200, f"{_pagination(len(projects))}<projects>{items}</projects>")
+
+        if path == f"/sites/{SITE_ID}/datasources":
+            with self.state.lock:
+                datasources = [
+                    d for d in self.state.datasources.values()
+                    if filters.get("name", d["name"]) == d["name"]
+                    and filters.get("projectName", d["project_name"]) == d["project_name"]
+                ]
+            items = "".join(self._datasource_xml(d) for d in datasources)
+            return self._send(200, f"{_pagination(len(datasources))}<datasources>{items}</datasources>")
+
+        match = re.fullmatch(f"/sites/{SITE_ID}/jobs/([^/]+)", path)
+        if match:
+            with self.state.lock:
+                job = self.state.jobs.get(match.group(1))
+                if job is None:
+                    return self._error(404, "404000", "Job not found")
+                job["polls"] += 1
+                progress = min(100, int(100 * job["polls"] / self.state.job_polls))
+                completed = f' completedAt="{_now()}" finishCode="0"' if progress == 100 else ""
+            return self._send(
+                200,
+                f'<job id="{job["id"]}" type="{job["type"]}" progress="{progress}" createdAt="{job["created_at"]}"{completed}>'
+                f'<datasource id="{job["datasource_id"]}" name={quoteattr(job["datasource_name"])}/></job>',
+            )
+
+        self._error(404, "404000", "Resource not found")
+
+    def do_POST(self):
+        path, query = self._route("POST")
+        body = self._body()
+
+        if path == "/auth/signin":
+            token = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.tokens[token] = time.monotonic() + self.state.token_ttl
+            return self._send(200, f'<credentials token="{token}"><site id="{SITE_ID}" contentUrl="stub"/><user id="{uuid.uuid4()}"/></credentials>')
+        if path == "/auth/signout":
+            with self.state.lock:
+                self.state.tokens.pop(self.headers.get("X-Tableau-Auth"), None)
+            return self._send(204)
+        if not self._authorized():
+            return
+
+        if path == f"/sites/{SITE_ID}/projects":
+            name = re.search(rb'<project[^>]*name="([^"]*)"', body).group(1).decode()
+            project = {"id": str(uuid.uuid4()), "name": name}
+            with self.state.lock:
+                self.state.projects[project["id"]] = project
+            return self._send(201, f'<project id="{project["id"]}" name={quoteattr(name)} contentPermissions="ManagedByOwner"/>')
+
+        if path == f"/sites/{SITE_ID}/fileUploads":
+            upload_id = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.uploads[upload_id] = 0
+            return self._send(201, f'<fileUpload uploadSessionId="{upload_id}" fileSize="0"/>')
+
+        if path == f"/sites/{SITE_ID}/datasources":
+            return self._publish(body, query)
+
+        self._error(404, "404000", "Resource not found")
+
+    def do_PUT(self):
+        path, _ = self._route("PUT")
+        body = self._body()
+        if not self._authorized():
+            return
+        match = re.fullmatch(f"/sites/{SITE_ID}/fileUploads/([^/]+)", path)
+        if match and match.group(1) in self.state.uploads:
+            with self.state.lock:
+                self.state.uploads[match.group(1)] += len(body)
+                size_mb = self.state.uploads[match.group(1)] // (1024 * 1024)
+            return self._send(200, f'<fileUpload uploadSessionId="{match.group(1)}" fileSize="{size_mb}"/>')
+        self._error(404, "404000", "Resource not found")
+
+    def do_PATCH(self):
+        path, query = self._route("PATCH")
+        body = self._body()
+        if not self._authorized():
+            return
+        match = re.fullmatch(f"/sites/{SITE_ID}/datasources/([^/]+)/data", path)
+        if not match:
+            return self._error(404, "404000", "Resource not found")
+
+        with self.state.lock:
+            datasource = self.state.datasources.get(match.group(1))
+            if datasource is None:
+                return self._error(404, "404011", "Datasource not found")
+            upload_id = query.get("uploadSessionId", [None])[0]
+            self.state.updates.setdefault(datasource["id"], []).append({
+                "request_id": self.headers.get("RequestID"),
+                "actions": json.loads(body or b"{}").get("actions", []),
+                "upload_bytes": self.state.uploads.get(upload_id, 0),
+            })
+            datasource["updated_at"] = _now()
+            job = {
+                "id": str(uuid.uuid4()), "type": "UpdateUploadedFile", "polls": 0, "created_at": _now(),
+                "datasource_id": datasource["id"], "datasource_name": datasource["name"],
+            }
+            self.state.jobs[job["id"]] = job
+        self._send(202, f'<job id="{job["id"]}" type="UpdateUploadedFile" progress="0" createdAt="{job["created_at"]}"/>')
+
+    # --- Publishing ---
+
+    @staticmethod
+    def _datasource_xml(datasource: dict) -> str:
+        return (
+            f'<datasource id="{datasource["id"]}" name={quoteattr(datasource["name"])} type="hyper" '
+            f'contentUrl={quoteattr(datasource["name"])} updatedAt="{datasource["updated_at"]}">'
+            f'<project id="{datasource["project_id"]}" name={quoteattr(datasource["project_name"])}/>'
+            f'<owner id="stub-owner"/></datasource>'
+        )
+
+    def _publish(self, body: bytes, query: dict):
+        request = re.search(rb"<datasource[^>]*>.*?</datasource>|<datasource[^>]*/>", body, re.S).group(0)
+        name = re.search(rb'name="([^"]*)"', request).group(1).decode()
+        project_id = re.search(rb'<project[^>]*id="([^"]*)"', request).group(1).decode()
+        overwrite = query.get("overwrite") == ["true"]
+
+        with self.state.lock:
+            project = self.state.projects.get(project_id)
+            if project is None:
+                return self._error(404, "404005", "Project not found")
+            existing = next(
+                (d for d in self.state.datasources.values() if d["name"] == name and d["project_id"] == project_id),
+                None,
+            )
+            if existing and not overwrite:
+                return self._error(409, "409004", "Datasource already exists")
+            datasource = existing or {"id": str(uuid.uuid4()), "name": name, "project_id": project_id, "project_name": project["name"]}
+            datasource["updated_at"] = _now()
+            self.state.datasources[datasource["id"]] = datasource
+
+            if query.get("asJob") == ["true"]:
+                job = {
+                    "id": str(uuid.uuid4()), "type": "PublishDatasource", "polls": 0, "created_at": _now(),
+                    "datasource_id": datasource["id"], "datasource_name": name,
+                }
+                self.state.jobs[job["id"]] = job
+                return self._send(202, f'<job id="{job["id"]}" type="PublishDatasource" progress="0" createdAt="{job["created_at"]}"/>')
+        self._send(201, self._datasource_xml(datasource))
+
+
+def serve(port: int = 8765, token_ttl: float = 3600, job_polls: int = 3) -> ThreadingHTTPServer:
+    """
+    Starts the stub on a background thread and returns the server (`.shutdown()` stops it).
+    `server.RequestHandlerClass.state` holds what it received.
+    """
+    handler = type("Handler", (StubHandler,), {"state": StubState(token_ttl, job_polls)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the Tableau REST API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-ttl", type=float, default=3600, help="Seconds before a session token expires.")
+    parser.add_argument("--job-polls", type=int, default=3, help="Polls before an async publish job completes.")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.token_ttl, args.job_polls)
+    print(f"Tableau stub listening on http://127.0.0.1:{args.port} (site '{SITE_ID}')")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import os
+
+from money import from_cents
+
+# Rows fetched from the server-side cursor (and written to the response) at a time.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Output columns, in order. `price` replaces `price_cents`, as an exact decimal amount.
+EXPORT_COLUMNS = [
+    "expenditure_id", "transaction_timestamp", "price", "nature", "is_shared",
+    "user_id", "full_name", "category_id", "primary_category", "sub_category",
+    "payment_method_id", "method_name", "institution",
+]
+
+
+def _record(row) -> dict:
+    record = dict(row._mapping)
+    record["transaction_timestamp"] = record["transaction_timestamp"].isoformat()
+    record["price"] = str(from_cents(record.pop("price_cents")))
+    return {name: record[name] for name in EXPORT_COLUMNS}
+
+
+def encode_ndjson(rows) -> bytes:
+    """
+    One JSON object per line. `price` is a string ("19.90"), so no client parses it into a float.
+    """
+    return "".join(json.dumps(_record(row), ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+def csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue().encode("utf-8")
+
+
+def encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(_record(row).values())
+    return buffer.getvalue().encode("utf-8")
+
+
+def stream_export(engine, stmt, format: str):
+    """
+    Runs `stmt` through a server-side cursor and yields the encoded rows, one chunk at a time.
+
+    Uses its own connection rather than the request's session, since the body is still being
+    sent after the route returns. Memory stays flat whatever the number of rows.
+
+    :param engine: SQLAlchemy engine.
+    :param stmt: Statement from `queries.build_export_query`.
+    :param format: `"ndjson"` or `"csv"`.
+    :type format: str
+    """
+    encode = encode_csv if format == "csv" else encode_ndjson
+    if format == "csv":
+        yield csv_header()
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_CHUNK_SIZE).execute(stmt)
+        for chunk in result.partitions():
+            yield encode(chunk)
+
+
+async def stream_export_async(async_engine, stmt, format: str):
+    """
+    Async version of `stream_export`, on the asyncpg engine.
+    """
+    encode = encode_csv if format == "csv" else encode_ndjson
+    if format == "csv":
+        yield csv_header()
+    async with async_engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        async for chunk in result.partitions():
+            yield encode(chunk)
@@ -0,0 +1,153 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class RefreshJob:
+    """
+    State of a single ETL run, updated by the worker thread and read by the API.
+    """
+    def __init__(self, full_refresh: bool = False):
+        self.job_id = uuid.uuid4().hex
+        self.full_refresh = full_refresh
+        self.status = "queued"
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Wraps one pipeline step and records its status and timing. A step that stops
+        the job must raise: leaving the block any other way records it as succeeded.
+
+        :param name: Stage name shown to the client (e.g. "extract").
+        :type name: str
+        """
+        entry = {"name": name, "status": "running", "started_at": _now(), "finished_at": None, "duration_seconds": None}
+        with self._lock:
+            self.stages.append(entry)
+        start = time.perf_counter()
+        try:
+            yield entry
+        except Exception as e:
+            self._finish_stage(entry, "failed", start, error=str(e))
+            raise
+        self._finish_stage(entry, "succeeded", start)
+
+    def _finish_stage(self, entry: dict, status: str, start: float, error: str | None = None):
+        with self._lock:
+            entry["status"] = status
+            if error is not None:
+                entry["error"] = error
+            entry["finished_at"] = _now()
+            entry["duration_seconds"] = round(time.perf_counter() - start, 3)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            duration = None
+            if self.started_at and self.finished_at:
+                duration = round((self.finished_at - self.started_at).total_seconds(), 3)
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "full_refresh": self.full_refresh,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "duration_seconds": duration,
+                "error": self.error,
+                "stages": [dict(s) for s in self.stages],
+            }
+
+
+class JobRunner:
+    """
+    Runs refresh jobs one at a time on a background thread.
+
+    While a job is queued or running, new submissions get that same job back
+    instead of starting a second pipeline, unless they ask for a full rebuild and
+    that job is incremental: then a full rebuild is queued behind it (or the queued
+    job is turned into one, if it hasn't started yet).
+    """
+    def __init__(self, target, max_history: int = 50):
+        """
+        :param target: Callable run for each job. Receives `tracker=<job>` and the submit kwargs,
+            and returns a truthy value on success.
+        :param max_history: How many finished jobs to keep around for status lookups.
+        :type max_history: int
+        """
+        self.target = target
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refresh-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = None # running, or next to run
+        self._queued = None # full rebuild waiting behind `_active`
+
+    def submit(self, full_refresh: bool = False) -> RefreshJob:
+        """
+        Enqueues a job, or returns the queued/running one that covers this request.
+
+        :param full_refresh: Passed through to the target.
+        :type full_refresh: bool
+        """
+        with self._lock:
+            if self._queued is not None and self._queued.is_active:
+                return self._queued
+            if self._active is not None and self._active.is_active:
+                if self._active.full_refresh or not full_refresh:
+                    return self._active
+                if self._active.status == "queued":
+                    self._active.full_refresh = True
+                    return self._active
+
+            job = RefreshJob(full_refresh=full_refresh)
+            self._jobs[job.job_id] = job
+            if self._active is not None and self._active.is_active:
+                self._queued = job
+            else:
+                self._active = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> RefreshJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: RefreshJob):
+        with self._lock:
+            job.status = "running"
+            job.started_at = _now()
+            if job is self._queued:
+                self._active, self._queued = job, None
+        try:
+            succeeded = self.target(tracker=job, full_refresh=job.full_refresh)
+            if not succeeded:
+                failed = [s["error"] for s in job.stages if s.get("error")]
+                job.error = failed[-1] if failed else "Pipeline stopped before finishing. Check the server logs."
+            job.status = "succeeded" if succeeded else "failed"
+        except Exception as e:
+            print(f"ETL Failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = _now()
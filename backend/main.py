@@ -1,25 +1,53 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from datetime import timedelta
-from jose import JWTError , jwt
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_
-from typing import List
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from typing import List, Literal
 
-from auth import verify_password, create_access_token, get_password_hash, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import verify_password_async, get_password_hash_async, needs_rehash, PasswordHashingBusy, hashing_stats
+from auth import Principal, resolve_principal, invalidate_user
 
 
 from pydantic import BaseModel
 import models
 import schemas
-from database import SessionLocal, engine
+import rollup
+import refresh_tokens
+import partitions
+from database import SessionLocal, engine, async_engine, DB_ASYNC
+from queries import ExpenditureFilters, build_expenditure_page_query, build_export_query, to_page, to_columnar, visible_expenditure_query
+from analytics import build_summary_query, to_columns
+from bulk_load import parse_records, validate_records, copy_expenditures, MAX_BULK_ROWS
 from etl.main import run_pipeline
+from jobs import JobRunner
+from pool_metrics import pool_snapshot
+from dimension_cache import dimension_cache, list_response
+from export import MEDIA_TYPES, stream_export
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, add_pool_collector, registry as metrics_registry
 
-# This line creates the database tables if they don't exist
-# based on our models.py definitions.
-models.Base.metadata.create_all(bind=engine)
+# The schema is managed by Alembic (see migrations/): run `alembic upgrade head` before starting the app.
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create this month's and next month's partitions now, so inserts rarely have to.
+    await run_in_threadpool(partitions.ensure_upcoming, engine)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+# Latency, in-flight requests and DB work per route, served at /metrics.
+app.add_middleware(MetricsMiddleware)
+add_pool_collector({"sync": engine, "async": async_engine.sync_engine if async_engine else None})
+
+# CRUD and listing routes. With DB_ASYNC, the async versions in async_routes.py are served instead.
+crud_router = APIRouter()
+
+# ETL runs in the background, one at a time
+refresh_jobs = JobRunner(run_pipeline)
 
 # Send user to login area if they want to login
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -35,44 +63,28 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     """
-    Decodes the token, extracts the email, and checks if the user exists.
-    
-    :param token: Description
+    The logged-in user, see `auth.resolve_principal`. Async so cache hits skip the
+    threadpool; the DB lookup on a miss still runs there.
+
+    :param token: Bearer token sent by the client.
     :type token: str
-    :param db: Description
+    :param db: Database session (only used on a cache miss).
     :type db: Session
     """
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"}
-    )
+    def load_user(email: str):
+        return db.query(models.DimUser).filter(models.DimUser.email == email).first()
 
-    try:
-        # Decode the token using our secret key
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str | None = payload.get("sub")        
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    # Check DB:
-    user = db.query(models.DimUser).filter(models.DimUser.email == email).first()
-    if user is None:
-        raise credentials_exception
-    
-    return user
+    return await resolve_principal(token, lambda email: run_in_threadpool(load_user, email))
     
 
 # Create a POST endpoint at the URL /expenditures/.
-@app.post("/expenditures/", response_model=schemas.ExpenditureCreate)
+@crud_router.post("/expenditures/", response_model=schemas.ExpenditureCreate)
 def create_expenditure(
     expenditure: schemas.ExpenditureCreate, 
     db: Session = Depends(get_db),
-    current_user: models.DimUser = Depends(get_current_user)):
+    current_user: Principal = Depends(get_current_user)):
     """
     Creates an expenditure linked to the logged-in user.
     """
@@ -84,125 +96,326 @@ def create_expenditure(
         user_id=current_user.user_id # Force correct user id
     )
 
-    # Add the new expenditure to the session and commit it to the database
+    # Add the new expenditure to the session and commit it to the database,
+    # together with its contribution to the monthly rollup
+    if partitions.pending_months([db_expenditure.transaction_timestamp]):
+        # End the session's read-only transaction so its connection goes back to the pool
+        # before the partition DDL takes one of its own.
+        db.commit()
+        partitions.ensure_partitions(engine, [db_expenditure.transaction_timestamp])
     db.add(db_expenditure)
+    db.flush()
+    rollup.apply_inserts(db, [rollup.as_rollup_row(db_expenditure)])
     db.commit()
     db.refresh(db_expenditure)
 
     return db_expenditure
 
 
+@app.post("/expenditures/bulk", response_model=schemas.BulkInsertResult)
+async def create_expenditures_bulk(
+    request: Request,
+    atomic: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)):
+    """
+    Imports many expenditures at once for the logged-in user.
+
+    The body can be a JSON array, NDJSON (`application/x-ndjson`) or CSV with a header row (`text/csv`).
+    Valid rows are loaded with a single `COPY` in one transaction; invalid rows are skipped
+    and reported back. With `atomic=true`, nothing is loaded if any row is invalid.
+    """
+    body = await request.body()
+    try:
+        records = parse_records(body, request.headers.get("content-type", ""))
+    except TypeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse body: {e}")
+
+    if len(records) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many rows: the limit is {MAX_BULK_ROWS} per request")
+
+    def load():
+        valid, errors = validate_records(db, records)
+        if atomic and errors:
+            return 0, errors
+        timestamps = [exp.transaction_timestamp for exp in valid]
+        if partitions.pending_months(timestamps):
+            # As in `create_expenditure`: release the session's connection before the DDL.
+            db.commit()
+            partitions.ensure_partitions(engine, timestamps)
+        inserted = copy_expenditures(db, valid, current_user.user_id)
+        rollup.apply_inserts(db, [rollup.as_rollup_row(exp, user_id=current_user.user_id) for exp in valid])
+        db.commit()
+        return inserted, errors
+
+    # The DB work is blocking, so keep it off the event loop.
+    inserted, errors = await run_in_threadpool(load)
+    return {"received": len(records), "inserted": inserted, "errors": errors}
+
+
+def hashing_busy_exception() -> HTTPException:
+    """
+    Returned when the password hashing queue is full. A new one per raise: a shared
+    instance would carry the traceback (and frames) of every request that raised it.
+    """
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-ins in progress, please try again in a moment.",
+        headers={"Retry-After": "1"},
+    )
+
 @app.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    """
+    Password hashing runs on the dedicated bcrypt pool and DB work in the threadpool,
+    so neither blocks the event loop.
+    """
     # Check if email already exists
-    db_user = db.query(models.DimUser).filter(models.DimUser.email == user.email).first()
+    db_user = await run_in_threadpool(lambda: db.query(models.DimUser).filter(models.DimUser.email == user.email).first())
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create the user (We will add hashig here in the following task)
-    hashed_pwd = get_password_hash(user.password)
+    try:
+        hashed_pwd = await get_password_hash_async(user.password)
+    except PasswordHashingBusy:
+        raise hashing_busy_exception()
     new_user = models.DimUser(
         email = user.email,
         hashed_password=hashed_pwd,
         full_name=user.full_name
     )
 
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    def save():
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+
+    await run_in_threadpool(save)
+    dimension_cache.bump("users")
     return new_user
 
 @app.post("/token", response_model=schemas.Token)
-def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
     """
     1. Takes the email/password (via `form_data`).
     2. Checks if they are correct.
     3. Returns a JWT Token.
+
+    If the stored hash uses an outdated work factor, it is replaced by one with `BCRYPT_ROUNDS`.
     """
     # OAuth2 form stores the email in a field called 'username'.
     print(f"Attempting login for: {form_data.username}")
     
-    user = db.query(models.DimUser).filter(models.DimUser.email == form_data.username).first()
+    user = await run_in_threadpool(lambda: db.query(models.DimUser).filter(models.DimUser.email == form_data.username).first())
 
     # Check 1: Does the user exist? | Check 2: Is password correct?
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    try:
+        password_ok = user is not None and await verify_password_async(form_data.password, user.hashed_password)
+    except PasswordHashingBusy:
+        raise hashing_busy_exception()
+    if not password_ok:
         raise HTTPException(
             status_code=401,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade the hash while we have the plain password. Not critical: skip it if the pool is busy.
+    if needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await get_password_hash_async(form_data.password)
+        except PasswordHashingBusy:
+            pass
+
     # If we get until here, password is correct.
-    # Generate the token (passport)
+    # Start a session: the refresh token keeps it alive without asking for the password again.
+    # Read before the commit: it expires `user`, and reloading it would be a blocking query on the event loop.
+    email = user.email
+
+    def start_session():
+        refresh_token, _ = refresh_tokens.issue(db, user.user_id)
+        db.commit()
+        return refresh_token
+
+    refresh_token = await run_in_threadpool(start_session)
+    return token_response(email, refresh_token)
+
+
+def token_response(email: str, refresh_token: str) -> dict:
+    """
+    Generates the access token (passport) and packs it with the refresh token.
+    """
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": email}, expires_delta=access_token_expires
     )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": int(access_token_expires.total_seconds()),
+    }
+
+@app.post("/token/refresh", response_model=schemas.Token)
+def refresh_access_token(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchanges a refresh token for a new access token and a new refresh token (no password, no bcrypt).
+
+    Each refresh token works once. Reusing one revokes the whole session.
+    """
+    try:
+        new_refresh_token, record = refresh_tokens.rotate(db, body.refresh_token)
+    except refresh_tokens.InvalidRefreshToken:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user = db.query(models.DimUser).filter(models.DimUser.user_id == record.user_id).first()
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    db.commit()
+    return token_response(user.email, new_refresh_token)
 
-    return {"access_token": access_token, "token_type": "bearer"}
+@app.post("/token/revoke")
+def revoke_refresh_token(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Ends the session the refresh token belongs to (logout).
+    """
+    refresh_tokens.revoke(db, body.refresh_token)
+    db.commit()
+    return {"message": "Session revoked"}
 
 
-@app.post("/categories/", response_model=schemas.Category)
+@crud_router.post("/categories/", response_model=schemas.Category)
 def create_category(category: schemas.CategoryCreate, db: Session=Depends(get_db)):
     db_category = models.DimCategory(**category.model_dump())
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    dimension_cache.bump("categories")
     return db_category
 
-@app.post("/payment_methods/", response_model=schemas.PaymentMethod)
+@crud_router.post("/payment_methods/", response_model=schemas.PaymentMethod)
 def create_payment_method(method: schemas.PaymentMethodCreate, db: Session=Depends(get_db)):
     db_method = models.DimPaymentMethod(**method.model_dump())
     db.add(db_method)
     db.commit()
     db.refresh(db_method)
+    dimension_cache.bump("payment_methods")
     return db_method
 
 
-@app.get("/users/", response_model=List[schemas.User])
-def get_users(db: Session = Depends(get_db)):
-    people = db.query(models.DimUser).all()
-    return people
-
-@app.get("/categories/", response_model=List[schemas.Category])
-def get_categories(db: Session = Depends(get_db)):
-    categories = db.query(models.DimCategory).all()
-    return categories
-
-@app.get("/payment_methods/", response_model=List[schemas.PaymentMethod])
-def get_payment_methods(db: Session = Depends(get_db)):
-    payment_methods = db.query(models.DimPaymentMethod).all()
-    return payment_methods
-
-@app.get("/expenditures/", response_model=List[schemas.ExpenditureRead])
+@crud_router.get("/users/", response_model=List[schemas.User])
+def get_users(request: Request, db: Session = Depends(get_db)):
+    """
+    Dimension lists are served from `dimension_cache`, with an `ETag`.
+    A matching `If-None-Match` gets a 304 without touching the database.
+    """
+    entry, version = dimension_cache.get("users")
+    if entry is None:
+        entry = dimension_cache.put("users", version, db.query(models.DimUser).all(), schemas.User)
+    return list_response(request, entry)
+
+@crud_router.get("/categories/", response_model=List[schemas.Category])
+def get_categories(request: Request, db: Session = Depends(get_db)):
+    entry, version = dimension_cache.get("categories")
+    if entry is None:
+        entry = dimension_cache.put("categories", version, db.query(models.DimCategory).all(), schemas.Category)
+    return list_response(request, entry)
+
+@crud_router.get("/payment_methods/", response_model=List[schemas.PaymentMethod])
+def get_payment_methods(request: Request, db: Session = Depends(get_db)):
+    entry, version = dimension_cache.get("payment_methods")
+    if entry is None:
+        entry = dimension_cache.put("payment_methods", version, db.query(models.DimPaymentMethod).all(), schemas.PaymentMethod)
+    return list_response(request, entry)
+
+@crud_router.get("/expenditures/", response_model=schemas.ExpenditurePage)
 def get_expenditures(db: Session = Depends(get_db),
-                     current_user: models.DimUser = Depends(get_current_user)):
+                     current_user: Principal = Depends(get_current_user),
+                     limit: int = Query(100, ge=1, le=500),
+                     cursor: str | None = None,
+                     filters: ExpenditureFilters = Depends(),
+                     format: Literal["json", "columnar"] = "json"):
     """
     Fetch only the expenditures if:
     1. The current user created them
      OR
     2. The expenditure is marked as "Shared" (`is_shared = True`).
+
+    Results come newest first, one page at a time. Pages are keyed on
+    (`transaction_timestamp`, `expenditure_id`), so asking for page N costs
+    the same as asking for page 1.
+
+    With `format=columnar`, rows come as column arrays that reference users, categories
+    and payment methods by ID, and each of those is sent once under `dimensions`.
     """
-    expenditures = (
-        db.query(models.FactExpenditure)
-        .filter(
-            or_(
-                models.FactExpenditure.user_id == current_user.user_id,
-                models.FactExpenditure.is_shared == True
-            )
-        )
-        .options(
-            joinedload(models.FactExpenditure.user),
-            joinedload(models.FactExpenditure.category),
-            joinedload(models.FactExpenditure.payment_method)
-        )
-        .all()
+    try:
+        stmt = build_expenditure_page_query(current_user.user_id, filters, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    expenditures = db.execute(stmt).unique().scalars().all()
+    page = to_page(expenditures, limit)
+    if format == "columnar":
+        return JSONResponse(to_columnar(page))
+    return page
+
+@crud_router.get("/expenditures/export")
+def export_expenditures(current_user: Principal = Depends(get_current_user),
+                        filters: ExpenditureFilters = Depends(),
+                        format: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Every expenditure `GET /expenditures/` would list (with the same filters), newest first,
+    streamed as NDJSON or CSV. Rows are read through a server-side cursor and sent as they
+    arrive, so the first bytes go out right away and memory use doesn't grow with the history.
+    """
+    stmt = build_export_query(current_user.user_id, filters)
+    return StreamingResponse(
+        stream_export(engine, stmt, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="expenditures.{format}"'},
+    )
+
+@crud_router.get("/analytics/summary", response_model=schemas.SpendSummary)
+def get_spend_summary(db: Session = Depends(get_db),
+                      current_user: Principal = Depends(get_current_user),
+                      grain: Literal["day", "week", "month"] = "month",
+                      dimensions: List[Literal["category", "primary_category", "payment_method", "user", "is_shared", "nature"]] = Query([]),
+                      nature: str | None = None,
+                      is_shared: bool | None = None,
+                      start_date: datetime | None = None,
+                      end_date: datetime | None = None):
+    """
+    Spend totals and counts per period, optionally broken down by `dimensions`.
+
+    Aggregation runs in Postgres; only the grouped rows are returned, as column arrays.
+    Covers the same expenditures as `GET /expenditures/` (own + shared).
+    """
+    stmt, column_names = build_summary_query(
+        current_user.user_id,
+        grain=grain,
+        dimensions=dimensions,
+        nature=nature,
+        is_shared=is_shared,
+        start_date=start_date,
+        end_date=end_date,
     )
-    return expenditures
+    rows = db.execute(stmt).all()
+    return {
+        "grain": grain,
+        "dimensions": dimensions,
+        "row_count": len(rows),
+        "columns": to_columns(rows, column_names),
+    }
 
 # --- Delete Endpoints ---
 
-@app.delete("/users/{user_id}")
+@crud_router.delete("/users/{user_id}")
 def delete_user(user_id: int, db: Session = Depends(get_db)):
     user = db.query(models.DimUser).filter(models.DimUser.user_id == user_id).first()
     if not user:
@@ -216,9 +429,12 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=400, detail="Cannot delete: This item is used in existing records.")
     
+    # Sessions of the deleted user must stop working right away
+    invalidate_user(user_id)
+    dimension_cache.bump("users")
     return {"message": "user deleted successfully"}
 
-@app.delete("/categories/{category_id}")
+@crud_router.delete("/categories/{category_id}")
 def delete_category(category_id: int, db: Session = Depends(get_db)):
     category = db.query(models.DimCategory).filter(models.DimCategory.category_id == category_id).first()
     if not category:
@@ -231,9 +447,10 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=400, detail="Cannot delete: This category is used in existign records.")
     
+    dimension_cache.bump("categories")
     return {"message": "Category deleted successfully"}
 
-@app.delete("/payment_methods/{payment_method_id}")
+@crud_router.delete("/payment_methods/{payment_method_id}")
 def delete_payment_method(payment_method_id: int, db: Session = Depends(get_db)):
     method = db.query(models.DimPaymentMethod).filter(models.DimPaymentMethod.payment_method_id == payment_method_id).first()
     if not method:
@@ -245,51 +462,97 @@ def delete_payment_method(payment_method_id: int, db: Session = Depends(get_db))
         db.rollback()   
         raise HTTPException(status_code=400, detail="Cannot delete: this payment method is used in existing records")
     
+    dimension_cache.bump("payment_methods")
     return {"message": "Payment Method deleted successfully"}
 
-@app.delete("/expenditures/{expenditure_id}")
+@crud_router.delete("/expenditures/{expenditure_id}")
 def delete_expenditure(
     expenditure_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.DimUser = Depends(get_current_user)):
+    current_user: Principal = Depends(get_current_user)):
     """
     Delete an expenditure if:
     1. User owns it 
     OR
     2. It is shared.
     """
-    exp = (
-        db.query(models.FactExpenditure)
-        .filter(models.FactExpenditure.expenditure_id == expenditure_id)
-        .filter(
-            or_(
-                models.FactExpenditure.user_id == current_user.user_id,
-                models.FactExpenditure.is_shared == True
-            )
-        )
-        .first()
-    )
+    exp = db.execute(visible_expenditure_query(expenditure_id, current_user.user_id)).scalars().first()
 
     if not exp:
         raise HTTPException(status_code=404, detail="Expenditure not found (or you don't have permission)")
     
     db.delete(exp)
+    # Record the deletion in the same transaction so the ETL can't miss it.
+    db.add(models.ExpenditureDeletion(expenditure_id=exp.expenditure_id))
+    db.flush()
+    rollup.refresh_group(db, exp)
     db.commit()
     return {"message": "Deleted successfully"}
 
-@app.post("/refresh")
-def refresh_data():
+@app.post("/refresh", response_model=schemas.RefreshJob, status_code=202)
+def refresh_data(full_refresh: bool = False):
+    """
+    Queues the ETL that updates the Hyper extract and Tableau, and returns right away.
+
+    If a refresh is already queued or running, that job is returned instead of starting another one.
+    Poll `GET /refresh/{job_id}` for progress.
     """
-    Triggers the ETL to update the database and Tableau.
+    print("API received request: Queueing ETL process...")
+    job = refresh_jobs.submit(full_refresh=full_refresh)
+    return job.to_dict()
+
+@app.get("/refresh/{job_id}", response_model=schemas.RefreshJob)
+def get_refresh_status(job_id: str):
     """
-    try:
-        print("API received request: Starting ETL process...")
+    Returns the status of an ETL job, with per-stage progress and timings.
+    """
+    job = refresh_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Refresh job not found")
+    return job.to_dict()
+
+@app.get("/etl/runs", response_model=List[schemas.EtlRun])
+def list_etl_runs(limit: int = Query(20, ge=1, le=200), db: Session = Depends(get_db)):
+    """
+    The latest ETL runs, newest first, with per-stage timings, row counts, bytes written,
+    peak memory and extract size, to compare a run with the ones before it.
+    """
+    return db.query(models.EtlRun).order_by(models.EtlRun.started_at.desc()).limit(limit).all()
 
-        # Calls the function to run pipeline
-        run_pipeline()
 
-        return {"status": "success", "message": "Data refreshed successfully!"}
-    
-    except Exception as e:
-        print(f"ETL Failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+@app.get("/stats/pool")
+def get_pool_stats():
+    """
+    Occupancy and counters of the shared database pool (checkout waits, timeouts,
+    connects/closes/invalidations since startup), for sizing `DB_POOL_SIZE` and `DB_MAX_OVERFLOW`.
+
+    With DB_ASYNC, the asyncpg engine's pool (used by the CRUD/listing routes) is under `async_pool`.
+    """
+    snapshot = pool_snapshot(engine)
+    if async_engine is not None:
+        snapshot["async_pool"] = pool_snapshot(async_engine.sync_engine)
+    return snapshot
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Request latency, requests in flight, database queries per request, JWT and bcrypt
+    timings, and pool occupancy, in the Prometheus text format.
+    """
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/stats/password-hashing")
+def get_password_hashing_stats():
+    """
+    Work factor, queue occupancy and latency of the password hashing pool.
+    """
+    return hashing_stats.to_dict()
+
+
+if DB_ASYNC:
+    import async_routes
+    app.include_router(async_routes.router)
+else:
+    app.include_router(crud_router)
@@ -0,0 +1,301 @@
+"""
+Request metrics, served at `/metrics` in the Prometheus text format:
+
+- latency per route (histogram) and requests in flight;
+- database queries per request, and the time they took (SQLAlchemy event hooks);
+- time spent signing/verifying JWTs and in bcrypt.
+
+Kept dependency-free, like `pool_metrics.py`: a few thread-safe counters rendered by hand.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from pool_metrics import pool_snapshot
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+AUTH_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self, items) -> list[str]:
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(series['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics to render, plus callbacks that produce lines on demand (e.g. pool occupancy).
+    """
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        :param collector: Callable returning a list of exposition lines, called on every scrape.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to serve a request, until the last byte of the body is sent.",
+    ("method", "route", "status"),
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being served.", ("method",),
+))
+REQUEST_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "Database queries run by one request.", ("method", "route"), QUERY_COUNT_BUCKETS,
+))
+REQUEST_DB_SECONDS = registry.register(Histogram(
+    "http_request_db_seconds", "Time one request spent in database queries.", ("method", "route"),
+))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "Database queries, from requests and background work (ETL, jobs).",
+))
+DB_QUERY_SECONDS = registry.register(Counter(
+    "db_query_seconds_total", "Time spent in database queries.",
+))
+JWT_SECONDS = registry.register(Histogram(
+    "auth_jwt_seconds", "Time to sign (encode) or check (decode) a JWT.", ("operation",), AUTH_BUCKETS,
+))
+BCRYPT_SECONDS = registry.register(Histogram(
+    "auth_bcrypt_seconds", "Time spent in bcrypt, per operation (hash | verify).", ("operation",), AUTH_BUCKETS,
+))
+BCRYPT_QUEUED_SECONDS = registry.register(Histogram(
+    "auth_bcrypt_queued_seconds", "Time a bcrypt job waited for a hashing worker.", ("operation",), AUTH_BUCKETS,
+))
+
+
+class RequestDbStats:
+    """
+    Database work of the current request. Shared by reference with the threadpool
+    and the async session, which see the same context.
+    """
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_db: ContextVar[RequestDbStats | None] = ContextVar("request_db", default=None)
+
+
+def instrument_queries(engine):
+    """
+    Counts and times every statement run on `engine` (for an `AsyncEngine`, pass its `sync_engine`).
+    """
+    # The start time rides on the statement's execution context, so a statement that
+    # fails (no `after_cursor_execute`) leaves nothing behind.
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        DB_QUERIES.inc()
+        DB_QUERY_SECONDS.inc(seconds)
+        stats = _request_db.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += seconds
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times each HTTP request and collects its database work.
+
+    Plain ASGI rather than `@app.middleware("http")`, so streamed responses are timed
+    until their last chunk and the body isn't buffered. Routes are labelled by their
+    template (`/expenditures/{expenditure_id}`), not the raw path, to keep the series few.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        stats = RequestDbStats()
+        token = _request_db.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec(method=method)
+            _request_db.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(seconds, method=method, route=route, status=status)
+            REQUEST_DB_QUERIES.observe(stats.queries, method=method, route=route)
+            REQUEST_DB_SECONDS.observe(stats.seconds, method=method, route=route)
+
+
+# Pool figures exposed by `add_pool_collector`: (name, type, help, key in `pool_snapshot`).
+POOL_METRICS = (
+    ("db_pool_size", "gauge", "Connections the pool keeps open.", "size"),
+    ("db_pool_checked_out", "gauge", "Connections in use.", "checked_out"),
+    ("db_pool_overflow", "gauge", "Connections open beyond the pool size.", "overflow"),
+    ("db_pool_checkouts_total", "counter", "Connections handed out.", "checkouts"),
+    ("db_pool_checkout_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.", "checkout_timeouts"),
+    ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.", "wait_seconds_total"),
+    ("db_pool_connects_total", "counter", "Connections opened.", "connects"),
+)
+
+
+def add_pool_collector(engines: dict):
+    """
+    Exposes the occupancy and counters of each engine's pool (see `pool_metrics.pool_snapshot`),
+    labelled by `pool`.
+
+    :param engines: Label value -> sync `Engine` (an `AsyncEngine`'s `sync_engine`); `None` entries are skipped.
+    :type engines: dict
+    """
+    engines = {name: engine for name, engine in engines.items() if engine is not None}
+
+    def collect():
+        snapshots = {name: pool_snapshot(engine) for name, engine in engines.items()}
+        lines = []
+        for metric, kind, help, key in POOL_METRICS:
+            samples = [(name, s[key]) for name, s in snapshots.items() if key in s]
+            if not samples:
+                continue
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+            lines += [f'{metric}{{pool="{_escape(name)}"}} {_number(value)}' for name, value in samples]
+        return lines
+
+    registry.add_collector(collect)
@@ -0,0 +1,51 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+import models
+from database import DATABASE_URL
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Models are the target for `alembic revision --autogenerate`.
+target_metadata = models.Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """
+    Emits the SQL instead of running it (`alembic upgrade head --sql`).
+    """
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """
+    Runs the migrations on their own connection. Not the app's engine: its
+    `statement_timeout` (`DB_STATEMENT_TIMEOUT_MS`) would cancel long migrations
+    (index builds, backfills) halfway.
+    """
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,155 @@
+"""Baseline: the schema the app used to create with create_all
+
+Every statement is idempotent, so this revision can run against an empty database
+as well as one created (at any point) by `Base.metadata.create_all`. Tables and
+columns added after the table was first created (e.g. `updated_at`) are filled in.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from analytics import REPORTING_TIMEZONE
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # --- Dimensions ---
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS dim_user (
+            user_id SERIAL PRIMARY KEY,
+            email VARCHAR NOT NULL,
+            hashed_password VARCHAR NOT NULL,
+            full_name VARCHAR
+        )
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_dim_user_email ON dim_user (email)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_dim_user_user_id ON dim_user (user_id)")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS dim_payment_method (
+            payment_method_id SERIAL PRIMARY KEY,
+            method_name VARCHAR(255) NOT NULL,
+            institution VARCHAR(255),
+            CONSTRAINT uq_payment_method UNIQUE (method_name, institution)
+        )
+    """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS dim_category (
+            category_id SERIAL PRIMARY KEY,
+            primary_category VARCHAR(255) NOT NULL,
+            sub_category VARCHAR(255) NOT NULL,
+            cost_type VARCHAR(50) NOT NULL,
+            CONSTRAINT uq_category UNIQUE (primary_category, sub_category)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_dim_category_category_id ON dim_category (category_id)")
+
+    # --- Facts ---
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS fact_expenditures (
+            expenditure_id SERIAL PRIMARY KEY,
+            transaction_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+            price FLOAT NOT NULL,
+            nature VARCHAR,
+            is_shared BOOLEAN,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            user_id INTEGER NOT NULL REFERENCES dim_user (user_id),
+            category_id INTEGER REFERENCES dim_category (category_id),
+            payment_method_id INTEGER REFERENCES dim_payment_method (payment_method_id)
+        )
+    """)
+    op.execute("""
+        ALTER TABLE fact_expenditures
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_fact_expenditures_expenditure_id ON fact_expenditures (expenditure_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_fact_expenditures_ts_id ON fact_expenditures (transaction_timestamp, expenditure_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_fact_expenditures_user_ts_id ON fact_expenditures (user_id, transaction_timestamp, expenditure_id)")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_fact_expenditures_shared_ts_id
+        ON fact_expenditures (transaction_timestamp, expenditure_id) WHERE is_shared
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_fact_expenditures_updated_at ON fact_expenditures (updated_at)")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS expenditure_deletions (
+            deletion_id SERIAL PRIMARY KEY,
+            expenditure_id INTEGER NOT NULL,
+            deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_expenditure_deletions_deleted_at ON expenditure_deletions (deleted_at)")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS fact_expenditures_monthly (
+            rollup_id SERIAL PRIMARY KEY,
+            month DATE NOT NULL,
+            user_id INTEGER NOT NULL,
+            category_id INTEGER,
+            payment_method_id INTEGER,
+            is_shared BOOLEAN,
+            nature VARCHAR,
+            total_price FLOAT NOT NULL,
+            expenditure_count INTEGER NOT NULL,
+            min_price FLOAT NOT NULL,
+            max_price FLOAT NOT NULL,
+            CONSTRAINT uq_fact_expenditures_monthly_key
+                UNIQUE NULLS NOT DISTINCT (month, user_id, category_id, payment_method_id, is_shared, nature)
+        )
+    """)
+    # Facts may already exist: (re)build the rollup from them. Safe to repeat.
+    # Spelled out (not `rollup.rebuild_statements()`), since later revisions change these columns.
+    month = f"CAST(date_trunc('month', timezone('{REPORTING_TIMEZONE}', transaction_timestamp)) AS DATE)"
+    op.execute("DELETE FROM fact_expenditures_monthly")
+    op.execute(f"""
+        INSERT INTO fact_expenditures_monthly
+            (month, user_id, category_id, payment_method_id, is_shared, nature,
+             total_price, expenditure_count, min_price, max_price)
+        SELECT {month}, user_id, category_id, payment_method_id, is_shared, nature,
+               sum(price), count(*), min(price), max(price)
+        FROM fact_expenditures
+        GROUP BY {month}, user_id, category_id, payment_method_id, is_shared, nature
+    """)
+
+    # --- Auth ---
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            token_id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES dim_user (user_id) ON DELETE CASCADE,
+            token_hash VARCHAR(64) NOT NULL UNIQUE,
+            family_id VARCHAR(32) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            revoked_at TIMESTAMP WITH TIME ZONE,
+            replaced_by_id INTEGER
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id ON refresh_tokens (user_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_refresh_tokens_family_id ON refresh_tokens (family_id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in (
+        "refresh_tokens",
+        "fact_expenditures_monthly",
+        "expenditure_deletions",
+        "fact_expenditures",
+        "dim_category",
+        "dim_payment_method",
+        "dim_user",
+    ):
+        op.execute(f"DROP TABLE IF EXISTS {table}")
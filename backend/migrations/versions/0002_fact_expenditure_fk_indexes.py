@@ -0,0 +1,39 @@
+"""Index the foreign keys of fact_expenditures, drop the duplicate primary key index
+
+`category_id` and `payment_method_id` are used by the ETL joins and checked on every
+category/payment method delete. `ix_fact_expenditures_expenditure_id` only repeated
+the primary key index, at the cost of an extra write per insert.
+
+Indexes are built CONCURRENTLY so writes aren't blocked on a populated table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_expenditures_category_id ON fact_expenditures (category_id)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_expenditures_payment_method_id ON fact_expenditures (payment_method_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_fact_expenditures_expenditure_id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_expenditures_expenditure_id ON fact_expenditures (expenditure_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_fact_expenditures_payment_method_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_fact_expenditures_category_id")
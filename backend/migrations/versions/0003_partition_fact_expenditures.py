@@ -0,0 +1,126 @@
+"""Partition fact_expenditures by month of transaction_timestamp
+
+The table becomes `PARTITION BY RANGE (transaction_timestamp)` with one partition per
+UTC month (`fact_expenditures_YYYY_MM`) and a default partition for months that don't
+have one yet (see `partitions.py`, which creates them as rows arrive).
+
+Postgres needs the partition key in the primary key, so it becomes
+(expenditure_id, transaction_timestamp). IDs keep coming from the same sequence.
+
+Rows are copied into the new table in one transaction: writes to the table wait for it.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    "expenditure_id, transaction_timestamp, price, nature, is_shared, updated_at, "
+    "user_id, category_id, payment_method_id"
+)
+
+INDEXES = (
+    "ix_fact_expenditures_ts_id",
+    "ix_fact_expenditures_user_ts_id",
+    "ix_fact_expenditures_shared_ts_id",
+    "ix_fact_expenditures_updated_at",
+    "ix_fact_expenditures_category_id",
+    "ix_fact_expenditures_payment_method_id",
+)
+
+
+def create_table(partitioned: bool) -> None:
+    primary_key = "(expenditure_id, transaction_timestamp)" if partitioned else "(expenditure_id)"
+    op.execute(f"""
+        CREATE TABLE fact_expenditures (
+            expenditure_id INTEGER NOT NULL DEFAULT nextval('fact_expenditures_expenditure_id_seq'),
+            transaction_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+            price FLOAT NOT NULL,
+            nature VARCHAR,
+            is_shared BOOLEAN,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            user_id INTEGER NOT NULL REFERENCES dim_user (user_id),
+            category_id INTEGER REFERENCES dim_category (category_id),
+            payment_method_id INTEGER REFERENCES dim_payment_method (payment_method_id),
+            CONSTRAINT fact_expenditures_pkey PRIMARY KEY {primary_key}
+        ){" PARTITION BY RANGE (transaction_timestamp)" if partitioned else ""}
+    """)
+    # The sequence belongs to the new table, so dropping the old one leaves it alone.
+    op.execute("ALTER SEQUENCE fact_expenditures_expenditure_id_seq OWNED BY fact_expenditures.expenditure_id")
+
+
+def create_indexes() -> None:
+    # On the partitioned table, each index is created on every partition (and future ones).
+    op.execute("CREATE INDEX ix_fact_expenditures_ts_id ON fact_expenditures (transaction_timestamp, expenditure_id)")
+    op.execute("CREATE INDEX ix_fact_expenditures_user_ts_id ON fact_expenditures (user_id, transaction_timestamp, expenditure_id)")
+    op.execute("""
+        CREATE INDEX ix_fact_expenditures_shared_ts_id ON fact_expenditures (transaction_timestamp, expenditure_id)
+        WHERE is_shared
+    """)
+    op.execute("CREATE INDEX ix_fact_expenditures_updated_at ON fact_expenditures (updated_at)")
+    op.execute("CREATE INDEX ix_fact_expenditures_category_id ON fact_expenditures (category_id)")
+    op.execute("CREATE INDEX ix_fact_expenditures_payment_method_id ON fact_expenditures (payment_method_id)")
+
+
+def set_aside_old_table() -> None:
+    op.execute("LOCK TABLE fact_expenditures IN EXCLUSIVE MODE")
+    op.execute("ALTER TABLE fact_expenditures RENAME TO fact_expenditures_old")
+    op.execute("ALTER TABLE fact_expenditures_old RENAME CONSTRAINT fact_expenditures_pkey TO fact_expenditures_old_pkey")
+    # Indexes are rebuilt on the new table after the copy, which is faster than maintaining them.
+    for index in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    set_aside_old_table()
+    create_table(partitioned=True)
+    op.execute("CREATE TABLE fact_expenditures_default PARTITION OF fact_expenditures DEFAULT")
+
+    # One partition per month that already has rows. Bounds are UTC month starts, as in `partitions.py`.
+    op.execute("""
+        DO $$
+        DECLARE
+            month_start timestamp;
+        BEGIN
+            FOR month_start IN
+                SELECT DISTINCT date_trunc('month', transaction_timestamp AT TIME ZONE 'UTC')
+                FROM fact_expenditures_old
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF fact_expenditures FOR VALUES FROM (%L) TO (%L)',
+                    'fact_expenditures_' || to_char(month_start, 'YYYY_MM'),
+                    to_char(month_start, 'YYYY-MM-DD') || ' 00:00:00+00',
+                    to_char(month_start + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+                );
+            END LOOP;
+        END
+        $$
+    """)
+
+    op.execute(f"INSERT INTO fact_expenditures ({COLUMNS}) SELECT {COLUMNS} FROM fact_expenditures_old")
+    op.execute("DROP TABLE fact_expenditures_old")
+    create_indexes()
+    op.execute("ANALYZE fact_expenditures")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    set_aside_old_table()
+    create_table(partitioned=False)
+    op.execute(f"INSERT INTO fact_expenditures ({COLUMNS}) SELECT {COLUMNS} FROM fact_expenditures_old")
+    # Also drops every partition, detached ones in the `archive` schema excepted.
+    op.execute("DROP TABLE fact_expenditures_old")
+    create_indexes()
+    op.execute("ANALYZE fact_expenditures")
@@ -0,0 +1,61 @@
+"""Store prices as integer cents
+
+`fact_expenditures.price` (FLOAT) becomes `price_cents` (BIGINT), and the rollup's
+`total_price`/`min_price`/`max_price` become `total_cents`/`min_cents`/`max_cents`.
+Sums are exact and run on integer arithmetic.
+
+Each float goes through NUMERIC first (15 significant digits), so 19.99 stored as
+19.989999... still becomes 1999. The rollup is then recomputed from the converted facts,
+which also drops any drift its float totals had picked up.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 11:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from analytics import REPORTING_TIMEZONE
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # One rewrite per partition; the type change propagates from the parent.
+    op.execute("ALTER TABLE fact_expenditures ALTER COLUMN price TYPE BIGINT USING round(price::numeric * 100)")
+    op.execute("ALTER TABLE fact_expenditures RENAME COLUMN price TO price_cents")
+
+    for old, new in (("total_price", "total_cents"), ("min_price", "min_cents"), ("max_price", "max_cents")):
+        op.execute(f"ALTER TABLE fact_expenditures_monthly ALTER COLUMN {old} TYPE BIGINT USING round({old}::numeric * 100)")
+        op.execute(f"ALTER TABLE fact_expenditures_monthly RENAME COLUMN {old} TO {new}")
+
+    # Exact totals, from the facts.
+    month = f"CAST(date_trunc('month', timezone('{REPORTING_TIMEZONE}', transaction_timestamp)) AS DATE)"
+    op.execute("DELETE FROM fact_expenditures_monthly")
+    op.execute(f"""
+        INSERT INTO fact_expenditures_monthly
+            (month, user_id, category_id, payment_method_id, is_shared, nature,
+             total_cents, expenditure_count, min_cents, max_cents)
+        SELECT {month}, user_id, category_id, payment_method_id, is_shared, nature,
+               sum(price_cents), count(*), min(price_cents), max(price_cents)
+        FROM fact_expenditures
+        GROUP BY {month}, user_id, category_id, payment_method_id, is_shared, nature
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for old, new in (("total_price", "total_cents"), ("min_price", "min_cents"), ("max_price", "max_cents")):
+        op.execute(f"ALTER TABLE fact_expenditures_monthly RENAME COLUMN {new} TO {old}")
+        op.execute(f"ALTER TABLE fact_expenditures_monthly ALTER COLUMN {old} TYPE FLOAT USING {old} / 100.0")
+
+    op.execute("ALTER TABLE fact_expenditures RENAME COLUMN price_cents TO price")
+    op.execute("ALTER TABLE fact_expenditures ALTER COLUMN price TYPE FLOAT USING price / 100.0")
@@ -0,0 +1,46 @@
+"""Add etl_runs, the history of ETL runs
+
+One row per run of `etl.main.run_pipeline`, with per-stage timings, row counts,
+bytes written, peak memory and extract size in `stages` (see `etl/instrumentation.py`).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS etl_runs (
+            run_id SERIAL PRIMARY KEY,
+            job_id VARCHAR(32),
+            status VARCHAR NOT NULL,
+            mode VARCHAR,
+            full_refresh BOOLEAN NOT NULL,
+            started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            finished_at TIMESTAMP WITH TIME ZONE,
+            duration_seconds FLOAT,
+            hyper_size_bytes BIGINT,
+            peak_rss_bytes BIGINT,
+            error TEXT,
+            stages JSON NOT NULL
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_etl_runs_started_at ON etl_runs (started_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS etl_runs")
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Boolean, Integer, Float, DateTime, ForeignKey, String, UniqueConstraint
+from sqlalchemy import Column, BigInteger, Boolean, Integer, Date, DateTime, Float, ForeignKey, JSON, Numeric, String, Text, UniqueConstraint, Index, cast, func
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from database import Base
+from money import to_cents, from_cents
 
 
 class DimUser(Base):
@@ -39,11 +41,16 @@ class DimCategory(Base):
 class FactExpenditure(Base):
     __tablename__ = "fact_expenditures"
 
-    expenditure_id = Column(Integer, primary_key=True, index=True)
-    transaction_timestamp = Column(DateTime(timezone=True), nullable=False)
-    price = Column(Float, nullable=False)
+    # The table is partitioned by month of `transaction_timestamp` (see `partitions.py`),
+    # and Postgres requires the partition key in the primary key.
+    expenditure_id = Column(Integer, primary_key=True, autoincrement=True)
+    transaction_timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    # Integer cents: exact, and cheaper to aggregate than NUMERIC. Read and set it through `price`.
+    price_cents = Column(BigInteger, nullable=False)
     nature = Column(String, default="Normal")
     is_shared = Column(Boolean, default=True)
+    # Bumped on every write; the ETL uses it as its high-water mark.
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
     # Foreign keys
     user_id = Column(Integer, ForeignKey("dim_user.user_id"), nullable=False)
@@ -51,7 +58,119 @@ class FactExpenditure(Base):
     category_id = Column(Integer, ForeignKey("dim_category.category_id"))
     payment_method_id = Column(Integer, ForeignKey("dim_payment_method.payment_method_id"))
 
+    @hybrid_property
+    def price(self):
+        """
+        Price as a `Decimal` with two places.
+        """
+        return from_cents(self.price_cents)
+
+    @price.inplace.setter
+    def _price_setter(self, value):
+        self.price_cents = to_cents(value)
+
+    @price.inplace.expression
+    @classmethod
+    def _price_expression(cls):
+        return cast(cast(cls.price_cents, Numeric) / 100, Numeric(12, 2))
+
     # Define the relationships
     user = relationship("DimUser", back_populates="expenditures")
     category = relationship("DimCategory")
-    payment_method = relationship("DimPaymentMethod")
\ No newline at end of file
+    payment_method = relationship("DimPaymentMethod")
+
+    # Indexes backing the keyset pagination on (transaction_timestamp, expenditure_id).
+    # Each branch of the listing query ("mine" and "shared") gets its own range scan.
+    __table_args__ = (
+        Index("ix_fact_expenditures_ts_id", "transaction_timestamp", "expenditure_id"),
+        Index("ix_fact_expenditures_user_ts_id", "user_id", "transaction_timestamp", "expenditure_id"),
+        Index(
+            "ix_fact_expenditures_shared_ts_id",
+            "transaction_timestamp",
+            "expenditure_id",
+            postgresql_where=is_shared,
+        ),
+        Index("ix_fact_expenditures_updated_at", "updated_at"),
+        # Foreign keys: ETL joins, and the checks run when a category/payment method is deleted.
+        Index("ix_fact_expenditures_category_id", "category_id"),
+        Index("ix_fact_expenditures_payment_method_id", "payment_method_id"),
+        {"postgresql_partition_by": "RANGE (transaction_timestamp)"},
+    )
+
+class ExpenditureDeletion(Base):
+    """
+    Log of deleted expenditures, so the incremental ETL can drop them from the extract.
+    """
+    __tablename__ = "expenditure_deletions"
+
+    deletion_id = Column(Integer, primary_key=True)
+    expenditure_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+class FactExpenditureMonthly(Base):
+    """
+    Monthly rollup of `fact_expenditures`, kept in sync on every write (see `rollup.py`).
+    Months are cut in the reporting time zone, like `/analytics/summary`.
+    """
+    __tablename__ = "fact_expenditures_monthly"
+
+    rollup_id = Column(Integer, primary_key=True)
+    month = Column(Date, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    category_id = Column(Integer)
+    payment_method_id = Column(Integer)
+    is_shared = Column(Boolean)
+    nature = Column(String)
+
+    # In cents, like `FactExpenditure.price_cents`.
+    total_cents = Column(BigInteger, nullable=False)
+    expenditure_count = Column(Integer, nullable=False)
+    min_cents = Column(BigInteger, nullable=False)
+    max_cents = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        # NULL category/payment method still identifies one group, hence NULLS NOT DISTINCT (Postgres 15+).
+        UniqueConstraint(
+            "month", "user_id", "category_id", "payment_method_id", "is_shared", "nature",
+            name="uq_fact_expenditures_monthly_key",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+class RefreshToken(Base):
+    """
+    Server-side record of a refresh token. Only a SHA-256 of the token is stored.
+
+    Every refresh replaces the token with a new one of the same `family_id` (one family per login).
+    Presenting a token that was already replaced revokes the whole family.
+    """
+    __tablename__ = "refresh_tokens"
+
+    token_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("dim_user.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True))
+    replaced_by_id = Column(Integer)
+
+class EtlRun(Base):
+    """
+    History of ETL runs, with per-stage measurements (see `etl/instrumentation.py`).
+    """
+    __tablename__ = "etl_runs"
+
+    run_id = Column(Integer, primary_key=True)
+    job_id = Column(String(32))
+    status = Column(String, nullable=False)
+    mode = Column(String) # full | incremental
+    full_refresh = Column(Boolean, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    finished_at = Column(DateTime(timezone=True))
+    duration_seconds = Column(Float)
+    hyper_size_bytes = Column(BigInteger)
+    peak_rss_bytes = Column(BigInteger)
+    error = Column(Text)
+    # [{"name", "status", "duration_seconds", "rows", "rows_deleted", "bytes_written", "hyper_size_bytes", "peak_rss_bytes"}]
+    stages = Column(JSON, nullable=False)
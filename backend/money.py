@@ -0,0 +1,36 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+
+# Prices are stored as integer cents, so sums are exact and run on integer arithmetic.
+CENT = Decimal("0.01")
+
+
+def to_cents(amount) -> int:
+    """
+    Converts an amount (Decimal, float, int or numeric string) to integer cents.
+    Floats go through their shortest repr, so `19.99` becomes 1999 and not 1998.
+
+    :param amount: Amount in currency units.
+    :return: Amount in cents, rounded half-even past the second decimal.
+    :rtype: int
+    """
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_EVEN) * 100)
+
+
+def from_cents(cents: int | None) -> Decimal | None:
+    """
+    Reverts `to_cents`, exactly.
+    """
+    if cents is None:
+        return None
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def cents_to_float(cents: int | None) -> float | None:
+    """
+    Amount as a JSON-friendly float. `1999 / 100` prints as `19.99`, so nothing is lost on the wire.
+    """
+    if cents is None:
+        return None
+    return int(cents) / 100
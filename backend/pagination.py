@@ -0,0 +1,30 @@
+import base64
+from datetime import datetime
+
+
+def encode_cursor(transaction_timestamp: datetime, expenditure_id: int) -> str:
+    """
+    Builds the opaque cursor that points right after the given row.
+
+    :param transaction_timestamp: Timestamp of the last row on the page.
+    :type transaction_timestamp: datetime
+    :param expenditure_id: ID of the last row on the page.
+    :type expenditure_id: int
+    """
+    raw = f"{transaction_timestamp.isoformat()}|{expenditure_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("utf-8")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Reverts `encode_cursor`. Raises `ValueError` if the cursor was tampered with.
+
+    :param cursor: Cursor string received from the client.
+    :type cursor: str
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8")
+        timestamp_part, id_part = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp_part), int(id_part)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
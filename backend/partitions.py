@@ -0,0 +1,239 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import models
+
+# `fact_expenditures` is partitioned by month of `transaction_timestamp` (UTC months).
+# Rows for a month without a partition land in the default partition; `ensure_partitions`
+# creates the month's partition (moving any such rows into it) before the app inserts.
+PARENT = models.FactExpenditure.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+# Schema that detached partitions are moved to.
+ARCHIVE_SCHEMA = "archive"
+
+# Months known to have a partition in this process (month -> when to check again), so inserts
+# only pay for the check once in a while. Entries expire because another process (the CLI's
+# `detach`) can take a partition away: after a detach, the API processes notice within this
+# many seconds and recreate the month's partition on the next insert. Until then, new rows of
+# that month land in the default partition, and are moved out when the partition is recreated.
+PARTITION_CACHE_SECONDS = float(os.getenv("PARTITION_CACHE_SECONDS", "300"))
+_known_months = {}
+_known_lock = threading.Lock()
+
+# ATTACH locks the default partition exclusively, so it waits for every reader of it (a long
+# listing, an export, the ETL extract) and everything after it queues behind. Give up after
+# this long: the rows go to the default partition, and the partition is tried again after
+# PARTITION_RETRY_SECONDS. `ensure_upcoming` creates partitions ahead of time so this is rare.
+PARTITION_LOCK_TIMEOUT_MS = int(os.getenv("PARTITION_LOCK_TIMEOUT_MS", "3000"))
+PARTITION_RETRY_SECONDS = float(os.getenv("PARTITION_RETRY_SECONDS", "60"))
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def month_of(timestamp: datetime) -> datetime:
+    """
+    First instant (UTC) of the month `timestamp` falls in. Naive timestamps are taken as UTC.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    timestamp = timestamp.astimezone(timezone.utc)
+    return datetime(timestamp.year, timestamp.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def create_partition(connection, month: datetime) -> bool:
+    """
+    Creates the partition for `month`, inside the caller's transaction, unless it exists.
+
+    Rows of that month already sitting in the default partition are moved into it first,
+    otherwise Postgres would refuse to attach it.
+
+    :param connection: SQLAlchemy connection (or session).
+    :param month: First instant of the month, from `month_of`.
+    :type month: datetime
+    :return: Whether a partition was created.
+    :rtype: bool
+    """
+    name = partition_name(month)
+    start, end = month.isoformat(), next_month(month).isoformat()
+
+    connection.execute(text(f"SET LOCAL lock_timeout = {PARTITION_LOCK_TIMEOUT_MS}"))
+    # Serialize creators of the same partition (other workers, the CLI).
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name})
+    attached = connection.execute(
+        text("SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:name) AND inhparent = CAST(:parent AS regclass)"),
+        {"name": name, "parent": PARENT},
+    ).scalar()
+    if attached:
+        return False
+
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(
+        text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE transaction_timestamp >= :start AND transaction_timestamp < :end
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """),
+        {"start": start, "end": end},
+    )
+    connection.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    return True
+
+
+def pending_months(timestamps) -> set[datetime]:
+    """
+    Months of `timestamps` that `ensure_partitions` would check (not known to this process).
+    """
+    now = time.monotonic()
+    with _known_lock:
+        return {month for month in map(month_of, timestamps) if _known_months.get(month, 0) <= now}
+
+
+def ensure_partitions(engine, timestamps) -> int:
+    """
+    Makes sure every month in `timestamps` has its partition. Call it before inserting.
+
+    Runs in its own short transaction, so the DDL never holds locks for the
+    duration of the caller's request. If the locks can't be had within
+    `PARTITION_LOCK_TIMEOUT_MS`, nothing is created and the rows go to the default partition.
+
+    :param engine: SQLAlchemy engine.
+    :param timestamps: Transaction timestamps about to be inserted.
+    :return: Number of partitions created.
+    :rtype: int
+    """
+    months = pending_months(timestamps)
+    if not months:
+        return 0
+
+    now = time.monotonic()
+    created = 0
+    try:
+        with engine.begin() as connection:
+            for month in sorted(months):
+                created += create_partition(connection, month)
+    except OperationalError as e:
+        if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE:
+            raise
+        print(f"Partition lock timeout, using the default partition for now: {', '.join(f'{m:%Y-%m}' for m in sorted(months))}")
+        with _known_lock:
+            _known_months.update(dict.fromkeys(months, now + PARTITION_RETRY_SECONDS))
+        return 0
+    with _known_lock:
+        _known_months.update(dict.fromkeys(months, now + PARTITION_CACHE_SECONDS))
+    return created
+
+
+def ensure_upcoming(engine) -> int:
+    """
+    Creates this month's and next month's partitions ahead of the inserts that need them
+    (called at startup and by the ETL). Failures are printed: inserts still work without them.
+    """
+    this_month = month_of(datetime.now(timezone.utc))
+    try:
+        return ensure_partitions(engine, [this_month, next_month(this_month)])
+    except Exception as e:
+        print(f"Could not create upcoming partitions: {e}")
+        return 0
+
+
+def list_partitions(connection) -> list[tuple[str, str]]:
+    """
+    Attached partitions and their bounds, oldest first.
+    """
+    rows = connection.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+        ORDER BY c.relname
+    """), {"parent": PARENT})
+    return [(name, bounds) for name, bounds in rows]
+
+
+def detach_partition(engine, month: datetime, drop: bool = False):
+    """
+    Takes a month out of `fact_expenditures`: its rows stop showing in the API, the
+    analytics fact queries and the ETL. The table is kept in the `archive` schema (with a
+    timestamp suffix if that month is already archived there), or dropped.
+
+    The monthly rollup keeps that month's totals. Run `python rollup.py rebuild` afterwards
+    to drop them too.
+    Other processes (the API workers) keep the month in their partition cache for up to
+    `PARTITION_CACHE_SECONDS`; restart them to have the detach take effect right away.
+    DETACH can't be CONCURRENTLY while a default partition exists, so it briefly locks the
+    table; the work is catalog-only, no rows are scanned or copied.
+
+    :return: Name of the table in the archive schema, or `None` if it was dropped.
+    """
+    name = partition_name(month)
+    archived = None
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        if drop:
+            connection.execute(text(f"DROP TABLE {name}"))
+        else:
+            connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            archived = name
+            # The month was detached before (and recreated since): keep both copies.
+            if connection.execute(text("SELECT to_regclass(:name)"), {"name": f"{ARCHIVE_SCHEMA}.{name}"}).scalar() is not None:
+                archived = f"{name}_{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+                connection.execute(text(f"ALTER TABLE {name} RENAME TO {archived}"))
+            connection.execute(text(f"ALTER TABLE {archived} SET SCHEMA {ARCHIVE_SCHEMA}"))
+    with _known_lock:
+        _known_months.pop(month, None)
+    return archived
+
+
+def _parse_month(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m").replace(tzinfo=timezone.utc)
+
+
+if __name__ == "__main__":
+    usage = (
+        "Usage:\n"
+        "  python partitions.py list\n"
+        "  python partitions.py ensure YYYY-MM [YYYY-MM]   # one month, or a range\n"
+        "  python partitions.py detach YYYY-MM [--drop]"
+    )
+    args = sys.argv[1:]
+    if not args or args[0] not in ("list", "ensure", "detach"):
+        print(usage)
+        sys.exit(1)
+
+    from database import engine
+
+    if args[0] == "list":
+        with engine.connect() as conn:
+            for name, bounds in list_partitions(conn):
+                print(f"{name}: {bounds}")
+    elif args[0] == "ensure" and len(args) in (2, 3):
+        first = _parse_month(args[1])
+        last = _parse_month(args[2]) if len(args) == 3 else first
+        months = []
+        while first <= last:
+            months.append(first)
+            first = next_month(first)
+        print(f"Created {ensure_partitions(engine, months)} partition(s).")
+    elif args[0] == "detach" and len(args) in (2, 3):
+        archived = detach_partition(engine, _parse_month(args[1]), drop="--drop" in args[2:])
+        print(f"Detached {partition_name(_parse_month(args[1]))}" + (f" to {ARCHIVE_SCHEMA}.{archived}." if archived else "."))
+        print(f"Running API processes notice within {PARTITION_CACHE_SECONDS:.0f}s (restart them to apply it now).")
+    else:
+        print(usage)
+        sys.exit(1)
@@ -0,0 +1,123 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """
+    Counters for one connection pool: how long checkouts wait, and how often
+    connections are opened, closed and invalidated (churn).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_timeouts = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.connects = 0
+            self.closes = 0
+            self.invalidations = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.checkout_timeouts
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / attempts, 6) if attempts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "connects": self.connects,
+                "closes": self.closes,
+                "invalidations": self.invalidations,
+            }
+
+
+class _TimedPool:
+    """
+    Records how long each checkout waited for a connection
+    (including opening a new one when the pool may still grow).
+    """
+    stats: PoolStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    """
+    `QueuePool` with checkout wait times, for the sync engine.
+    """
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    """
+    Same, for the asyncpg engine (an async engine needs an async-adapted pool).
+    """
+
+
+def instrument(engine):
+    """
+    Counts connection churn on an engine built with `poolclass=TimedQueuePool`
+    (or `TimedAsyncQueuePool`: pass the `AsyncEngine`'s `sync_engine`).
+    """
+    def stats():
+        return engine.pool.stats
+
+    event.listen(engine, "connect", lambda *args: stats().record("connects"))
+    event.listen(engine, "close", lambda *args: stats().record("closes"))
+    event.listen(engine, "invalidate", lambda *args: stats().record("invalidations"))
+
+
+def pool_snapshot(engine) -> dict:
+    """
+    Current occupancy of the engine's pool, plus its counters.
+    """
+    pool = engine.pool
+    snapshot = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+    }
+    if isinstance(pool, _TimedPool):
+        snapshot.update(pool.stats.to_dict())
+    return snapshot
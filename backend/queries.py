@@ -0,0 +1,214 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, tuple_, union
+from sqlalchemy.orm import joinedload
+
+import models
+from pagination import encode_cursor, decode_cursor
+
+# Statement builders shared by the sync and async routes.
+F = models.FactExpenditure
+
+
+@dataclass
+class ExpenditureFilters:
+    """
+    Optional filters of the expenditure listing endpoints. Used as `Depends()`,
+    so each field becomes a query parameter.
+    """
+    start_date: datetime | None = None
+    end_date: datetime | None = None
+    category_id: int | None = None
+    payment_method_id: int | None = None
+    user_id: int | None = None
+    is_shared: bool | None = None
+
+    def clauses(self) -> list:
+        """
+        WHERE clauses for every filter that was given, except `is_shared`
+        (which `visibility_branches` takes care of).
+        """
+        clauses = []
+        if self.start_date:
+            clauses.append(F.transaction_timestamp >= self.start_date)
+        if self.end_date:
+            clauses.append(F.transaction_timestamp < self.end_date)
+        if self.category_id is not None:
+            clauses.append(F.category_id == self.category_id)
+        if self.payment_method_id is not None:
+            clauses.append(F.payment_method_id == self.payment_method_id)
+        if self.user_id is not None:
+            clauses.append(F.user_id == self.user_id)
+        return clauses
+
+
+def visibility_branches(user_id: int, is_shared: bool | None = None) -> list[list]:
+    """
+    Splits "own OR shared" into separate branches, narrowed by the `is_shared` filter.
+
+    Each branch can walk its own index in (`transaction_timestamp`, `expenditure_id`) order,
+    which a single OR condition can't.
+    """
+    branches = []
+    if is_shared is not True:
+        own = [F.user_id == user_id]
+        if is_shared is False:
+            own.append(F.is_shared == False)
+        branches.append(own)
+    if is_shared is not False:
+        branches.append([F.is_shared == True])
+    return branches
+
+
+def build_expenditure_page_query(user_id: int, filters: ExpenditureFilters, limit: int, cursor: str | None = None):
+    """
+    One page of visible expenditures, newest first, with user/category/payment method loaded.
+
+    Fetches `limit + 1` rows so `to_page` can tell whether there is a next page.
+    Raises `ValueError` for an invalid cursor.
+
+    :param user_id: ID of the logged-in user.
+    :type user_id: int
+    :param cursor: `next_cursor` of the previous page.
+    :type cursor: str | None
+    """
+    clauses = filters.clauses()
+    if cursor:
+        cursor_ts, cursor_id = decode_cursor(cursor)
+        clauses.append(tuple_(F.transaction_timestamp, F.expenditure_id) < tuple_(cursor_ts, cursor_id))
+        # Implied by the row comparison, but only a plain range lets the planner skip later partitions.
+        clauses.append(F.transaction_timestamp <= cursor_ts)
+
+    # Run one ordered range scan per branch and merge them. Each branch only needs `limit + 1` rows.
+    branch_pages = [
+        select(F.expenditure_id, F.transaction_timestamp)
+        .where(*branch, *clauses)
+        .order_by(F.transaction_timestamp.desc(), F.expenditure_id.desc())
+        .limit(limit + 1)
+        .subquery()
+        for branch in visibility_branches(user_id, filters.is_shared)
+    ]
+    page_keys = union(*[select(page.c.expenditure_id, page.c.transaction_timestamp) for page in branch_pages]).subquery()
+
+    return (
+        select(F)
+        .join(page_keys, and_(
+            F.expenditure_id == page_keys.c.expenditure_id,
+            F.transaction_timestamp == page_keys.c.transaction_timestamp,
+        ))
+        .options(
+            joinedload(F.user),
+            joinedload(F.category),
+            joinedload(F.payment_method)
+        )
+        .order_by(F.transaction_timestamp.desc(), F.expenditure_id.desc())
+        .limit(limit + 1)
+    )
+
+
+def to_page(expenditures: list, limit: int) -> dict:
+    """
+    Trims the extra row fetched by `build_expenditure_page_query` and builds the page payload.
+    """
+    next_cursor = None
+    if len(expenditures) > limit:
+        expenditures = expenditures[:limit]
+        last = expenditures[-1]
+        next_cursor = encode_cursor(last.transaction_timestamp, last.expenditure_id)
+    return {"items": expenditures, "next_cursor": next_cursor}
+
+
+def build_export_query(user_id: int, filters: ExpenditureFilters):
+    """
+    Every visible expenditure matching `filters`, newest first, as flat rows
+    (dimension names joined in), for `GET /expenditures/export`.
+
+    Core columns, not ORM objects: rows are streamed, never held as a list.
+    """
+    visible = or_(*[and_(*branch) for branch in visibility_branches(user_id, filters.is_shared)])
+    return (
+        select(
+            F.expenditure_id,
+            F.transaction_timestamp,
+            F.price_cents,
+            F.nature,
+            F.is_shared,
+            F.user_id,
+            models.DimUser.full_name,
+            F.category_id,
+            models.DimCategory.primary_category,
+            models.DimCategory.sub_category,
+            F.payment_method_id,
+            models.DimPaymentMethod.method_name,
+            models.DimPaymentMethod.institution,
+        )
+        .outerjoin(models.DimUser, models.DimUser.user_id == F.user_id)
+        .outerjoin(models.DimCategory, models.DimCategory.category_id == F.category_id)
+        .outerjoin(models.DimPaymentMethod, models.DimPaymentMethod.payment_method_id == F.payment_method_id)
+        .where(visible, *filters.clauses())
+        .order_by(F.transaction_timestamp.desc(), F.expenditure_id.desc())
+    )
+
+
+def visible_expenditure_query(expenditure_id: int, user_id: int):
+    """
+    The expenditure with this ID, if the user owns it or it is shared.
+    """
+    return select(F).where(
+        F.expenditure_id == expenditure_id,
+        or_(F.user_id == user_id, F.is_shared == True),
+    )
+
+
+def to_columnar(page: dict) -> dict:
+    """
+    Re-shapes a page from `to_page` into column arrays plus dictionary-encoded dimensions.
+
+    Rows only carry the dimension IDs; each user, category and payment method on the page
+    is sent once, in `dimensions`, instead of being repeated in every row.
+    """
+    expenditures = page["items"]
+    users, categories, payment_methods = {}, {}, {}
+    for exp in expenditures:
+        if exp.user is not None:
+            users[exp.user_id] = exp.user
+        if exp.category is not None:
+            categories[exp.category_id] = exp.category
+        if exp.payment_method is not None:
+            payment_methods[exp.payment_method_id] = exp.payment_method
+
+    return {
+        "format": "columnar",
+        "row_count": len(expenditures),
+        "next_cursor": page["next_cursor"],
+        "columns": {
+            "expenditure_id": [exp.expenditure_id for exp in expenditures],
+            "transaction_timestamp": [exp.transaction_timestamp.isoformat() for exp in expenditures],
+            # Exact integer cents; divide by 100 for the amount.
+            "price_cents": [exp.price_cents for exp in expenditures],
+            "nature": [exp.nature for exp in expenditures],
+            "is_shared": [exp.is_shared for exp in expenditures],
+            "user_id": [exp.user_id for exp in expenditures],
+            "category_id": [exp.category_id for exp in expenditures],
+            "payment_method_id": [exp.payment_method_id for exp in expenditures],
+        },
+        "dimensions": {
+            "users": {
+                "user_id": list(users),
+                "email": [user.email for user in users.values()],
+                "full_name": [user.full_name for user in users.values()],
+            },
+            "categories": {
+                "category_id": list(categories),
+                "primary_category": [c.primary_category for c in categories.values()],
+                "sub_category": [c.sub_category for c in categories.values()],
+                "cost_type": [c.cost_type for c in categories.values()],
+            },
+            "payment_methods": {
+                "payment_method_id": list(payment_methods),
+                "method_name": [m.method_name for m in payment_methods.values()],
+                "institution": [m.institution for m in payment_methods.values()],
+            },
+        },
+    }
@@ -0,0 +1,93 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+import models
+from auth import REFRESH_TOKEN_EXPIRE_DAYS
+
+RT = models.RefreshToken
+
+
+class InvalidRefreshToken(Exception):
+    """
+    Raised when a refresh token is unknown, expired, revoked or reused.
+    """
+
+
+def hash_token(token: str) -> str:
+    """
+    Tokens are random 256-bit strings, so a plain SHA-256 is enough (unlike passwords).
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue(db: Session, user_id: int, family_id: str | None = None) -> tuple[str, models.RefreshToken]:
+    """
+    Creates a refresh token for the user. The caller commits.
+
+    :param family_id: Family of the token being rotated. A new family (a new login) if not given.
+    :type family_id: str | None
+    :return: The token to hand to the client, and its record.
+    """
+    token = secrets.token_urlsafe(32)
+    record = RT(
+        user_id=user_id,
+        token_hash=hash_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(record)
+    db.flush()
+    return token, record
+
+
+def _revoke_family(db: Session, family_id: str):
+    db.execute(
+        update(RT)
+        .where(RT.family_id == family_id, RT.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+
+def rotate(db: Session, token: str) -> tuple[str, models.RefreshToken]:
+    """
+    Exchanges a refresh token for a new one, and revokes the old one. The caller commits.
+
+    If the token had already been rotated, someone is replaying it: the whole family is
+    revoked (and committed) so that neither copy keeps working.
+    Raises `InvalidRefreshToken` if the token can't be used.
+
+    :return: The new token, and its record (with `user_id`).
+    """
+    # Lock the row so two concurrent refreshes with the same token can't both succeed.
+    record = db.execute(select(RT).where(RT.token_hash == hash_token(token)).with_for_update()).scalars().first()
+    if record is None:
+        raise InvalidRefreshToken()
+
+    if record.revoked_at is not None:
+        if record.replaced_by_id is not None:
+            _revoke_family(db, record.family_id)
+            db.commit()
+        raise InvalidRefreshToken()
+
+    if record.expires_at <= datetime.now(timezone.utc):
+        raise InvalidRefreshToken()
+
+    new_token, new_record = issue(db, record.user_id, family_id=record.family_id)
+    record.revoked_at = datetime.now(timezone.utc)
+    record.replaced_by_id = new_record.token_id
+    return new_token, new_record
+
+
+def revoke(db: Session, token: str):
+    """
+    Revokes the token's family (i.e. logs that session out). Unknown tokens are ignored.
+    The caller commits.
+    """
+    record = db.execute(select(RT).where(RT.token_hash == hash_token(token))).scalars().first()
+    if record is not None:
+        _revoke_family(db, record.family_id)
@@ -0,0 +1,185 @@
+import sys
+
+from sqlalchemy import BigInteger, Boolean, DateTime, Integer, String, cast, column, delete, func, literal, select, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import models
+from money import to_cents
+from analytics import REPORTING_TIMEZONE, period_of
+
+F = models.FactExpenditure
+R = models.FactExpenditureMonthly
+
+# Columns identifying one rollup row, in the order used by the INSERT ... SELECT statements.
+KEY_COLUMNS = ["month", "user_id", "category_id", "payment_method_id", "is_shared", "nature"]
+MEASURE_COLUMNS = ["total_cents", "expenditure_count", "min_cents", "max_cents"]
+
+# Rows per INSERT statement when applying a bulk load.
+APPLY_BATCH_SIZE = 5000
+
+
+def _aggregate_select(source, month):
+    """
+    SELECT producing rollup rows (keys + measures) from any source with fact-like columns.
+    """
+    keys = [month, source.c.user_id, source.c.category_id, source.c.payment_method_id, source.c.is_shared, source.c.nature]
+    return select(
+        *keys,
+        # sum() of a bigint comes back as NUMERIC; the totals fit in a bigint.
+        cast(func.sum(source.c.price_cents), BigInteger),
+        func.count(),
+        func.min(source.c.price_cents),
+        func.max(source.c.price_cents),
+    ).group_by(*keys)
+
+
+def apply_inserts(db: Session, rows: list[dict]):
+    """
+    Adds new expenditures to the rollup, inside the caller's transaction.
+
+    :param rows: Dicts with `transaction_timestamp`, `price_cents`, `user_id`, `category_id`,
+        `payment_method_id`, `is_shared` and `nature`.
+    :type rows: list[dict]
+    """
+    for start in range(0, len(rows), APPLY_BATCH_SIZE):
+        batch = rows[start:start + APPLY_BATCH_SIZE]
+        new_rows = values(
+            column("transaction_timestamp", DateTime(timezone=True)),
+            column("price_cents", BigInteger),
+            column("user_id", Integer),
+            column("category_id", Integer),
+            column("payment_method_id", Integer),
+            column("is_shared", Boolean),
+            column("nature", String),
+            name="new_rows",
+        ).data([
+            (
+                row["transaction_timestamp"], row["price_cents"], row["user_id"], row["category_id"],
+                row["payment_method_id"], row["is_shared"], row["nature"],
+            )
+            for row in batch
+        ])
+        # A VALUES column that is NULL in every row would come out as text; pin the types.
+        new_rows = select(*[cast(col, col.type).label(col.name) for col in new_rows.c]).subquery("typed_rows")
+
+        stmt = insert(R).from_select(
+            KEY_COLUMNS + MEASURE_COLUMNS,
+            _aggregate_select(new_rows, period_of("month", new_rows.c.transaction_timestamp)),
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_fact_expenditures_monthly_key",
+            set_={
+                "total_cents": R.total_cents + stmt.excluded.total_cents,
+                "expenditure_count": R.expenditure_count + stmt.excluded.expenditure_count,
+                "min_cents": func.least(R.min_cents, stmt.excluded.min_cents),
+                "max_cents": func.greatest(R.max_cents, stmt.excluded.max_cents),
+            },
+        )
+        db.execute(stmt)
+
+
+def as_rollup_row(expenditure, user_id: int | None = None) -> dict:
+    """
+    Picks the fields `apply_inserts` needs from a `FactExpenditure` or an `ExpenditureCreate`.
+
+    :param user_id: Overrides the expenditure's own `user_id`.
+    """
+    return {
+        "transaction_timestamp": expenditure.transaction_timestamp,
+        "price_cents": to_cents(expenditure.price),
+        "user_id": user_id if user_id is not None else expenditure.user_id,
+        "category_id": expenditure.category_id,
+        "payment_method_id": expenditure.payment_method_id,
+        "is_shared": expenditure.is_shared,
+        "nature": expenditure.nature,
+    }
+
+
+def refresh_group(db: Session, expenditure: models.FactExpenditure):
+    """
+    Recomputes the rollup row the given expenditure belongs to, from the fact table.
+
+    Used after deletes: a sum can be decremented but a min/max can't, so the group is
+    rebuilt instead. Only that user's rows for that month are read.
+    Call it after the change is flushed, inside the same transaction.
+    """
+    timestamp = literal(expenditure.transaction_timestamp, DateTime(timezone=True))
+    month = period_of("month", timestamp)
+    tz = literal(REPORTING_TIMEZONE, literal_execute=True)
+    month_start = func.timezone(tz, cast(month, DateTime))
+    month_end = func.timezone(tz, cast(month, DateTime) + func.make_interval(0, 1))
+
+    matches_key = [
+        R.month == month,
+        R.user_id == expenditure.user_id,
+        R.category_id.is_not_distinct_from(expenditure.category_id),
+        R.payment_method_id.is_not_distinct_from(expenditure.payment_method_id),
+        R.is_shared.is_not_distinct_from(expenditure.is_shared),
+        R.nature.is_not_distinct_from(expenditure.nature),
+    ]
+    db.execute(delete(R).where(*matches_key))
+
+    group_rows = (
+        select(F.price_cents, F.user_id, F.category_id, F.payment_method_id, F.is_shared, F.nature)
+        .where(
+            F.user_id == expenditure.user_id,
+            F.transaction_timestamp >= month_start,
+            F.transaction_timestamp < month_end,
+            F.category_id.is_not_distinct_from(expenditure.category_id),
+            F.payment_method_id.is_not_distinct_from(expenditure.payment_method_id),
+            F.is_shared.is_not_distinct_from(expenditure.is_shared),
+            F.nature.is_not_distinct_from(expenditure.nature),
+        )
+        .subquery()
+    )
+    stmt = insert(R).from_select(KEY_COLUMNS + MEASURE_COLUMNS, _aggregate_select(group_rows, month))
+    # Two deletes in the same group can both get here: the second one's DELETE waits on
+    # the first, misses the row the first one re-inserted, and would then hit the key.
+    # Its SELECT ran after the first committed, so its totals are the current ones.
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_fact_expenditures_monthly_key",
+        set_={name: getattr(stmt.excluded, name) for name in MEASURE_COLUMNS},
+    )
+    db.execute(stmt)
+
+
+def rebuild_statements() -> list:
+    """
+    Statements that recompute the whole rollup from the fact table, in order.
+    """
+    facts = F.__table__
+    return [
+        delete(R),
+        insert(R).from_select(
+            KEY_COLUMNS + MEASURE_COLUMNS,
+            _aggregate_select(facts, period_of("month", facts.c.transaction_timestamp)),
+        ),
+    ]
+
+
+def rebuild(db: Session):
+    """
+    Recomputes the whole rollup from the fact table (for backfills, or after manual edits).
+    The caller commits.
+    """
+    for stmt in rebuild_statements():
+        db.execute(stmt)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python rollup.py rebuild")
+        sys.exit(1)
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print("Rebuilding fact_expenditures_monthly...")
+        rebuild(db)
+        db.commit()
+        count = db.scalar(select(func.count()).select_from(R))
+        print(f"Done: {count} rollup rows.")
+    finally:
+        db.close()
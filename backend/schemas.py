@@ -1,5 +1,19 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, BeforeValidator, EmailStr, Field, PlainSerializer
 from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Any, Dict, List
+
+def _round_float_to_cents(value):
+    # A float like 0.1 + 0.2 can't be exact anyway; strings and Decimals must already be.
+    return round(value, 2) if isinstance(value, float) else value
+
+# Money: at most 2 decimal places on the way in, a plain JSON number on the way out.
+Money = Annotated[
+    Decimal,
+    BeforeValidator(_round_float_to_cents),
+    Field(max_digits=12, decimal_places=2),
+    PlainSerializer(float, return_type=float, when_used="json"),
+]
 
 
 # -- Dimension Schemas --
@@ -49,7 +63,7 @@ class PaymentMethod(BaseModel):
 # -- Expenditure Schema --     
 class ExpenditureCreate(BaseModel):
     transaction_timestamp: datetime
-    price: float
+    price: Money
     user_id: int | None = None
     category_id: int
     payment_method_id: int
@@ -62,7 +76,7 @@ class ExpenditureCreate(BaseModel):
 class ExpenditureRead(BaseModel):
     expenditure_id: int
     transaction_timestamp: datetime
-    price: float
+    price: Money
     nature: str
     is_shared: bool
 
@@ -74,12 +88,104 @@ class ExpenditureRead(BaseModel):
     class Config:
         from_attributes = True
 
+class ExpenditurePage(BaseModel):
+    """
+    One page of expenditures. Pass `next_cursor` back as `cursor` to get the next page.
+    """
+    items: List[ExpenditureRead]
+    next_cursor: str | None = None
+
+class BulkRowError(BaseModel):
+    row: int # Position of the record in the payload, starting at 1
+    errors: List[str]
+
+class BulkInsertResult(BaseModel):
+    received: int
+    inserted: int
+    errors: List[BulkRowError] = []
+
+# -- Analytics Schemas --
+class SpendSummary(BaseModel):
+    """
+    Aggregated spend in columnar form: `columns[name][i]` is the value of column `name` in row `i`.
+    """
+    grain: str
+    dimensions: List[str]
+    row_count: int
+    columns: Dict[str, List[Any]]
+
+# -- ETL Refresh Job Schemas --
+class RefreshStage(BaseModel):
+    name: str
+    status: str
+    started_at: datetime
+    finished_at: datetime | None = None
+    duration_seconds: float | None = None
+    rows: int | None = None
+    rows_deleted: int | None = None
+    bytes_written: int | None = None
+    hyper_size_bytes: int | None = None
+    peak_rss_bytes: int | None = None
+    error: str | None = None # why a failed stage stopped
+
+class RefreshJob(BaseModel):
+    """
+    Status of an ETL run started through `POST /refresh`.
+    """
+    job_id: str
+    status: str # queued | running | succeeded | failed
+    full_refresh: bool
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    duration_seconds: float | None = None
+    error: str | None = None
+    stages: List[RefreshStage] = []
+
+class EtlRunStage(BaseModel):
+    name: str
+    status: str
+    duration_seconds: float | None = None
+    rows: int | None = None
+    rows_deleted: int | None = None
+    bytes_written: int | None = None # extract (full) or delta file in "transform", upload in "publish"
+    hyper_size_bytes: int | None = None
+    peak_rss_bytes: int | None = None
+
+class EtlRun(BaseModel):
+    """
+    A finished ETL run, from the `etl_runs` history.
+    """
+    run_id: int
+    job_id: str | None = None
+    status: str # succeeded | failed
+    mode: str | None = None # full | incremental
+    full_refresh: bool
+    started_at: datetime
+    finished_at: datetime | None = None
+    duration_seconds: float | None = None
+    hyper_size_bytes: int | None = None
+    peak_rss_bytes: int | None = None
+    error: str | None = None
+    stages: List[EtlRunStage] = []
+
+    class Config:
+        from_attributes = True
+
 class Token(BaseModel):
     """
     Schema for the JWT Token response.
     """
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+    expires_in: int | None = None
+
+class RefreshRequest(BaseModel):
+    """
+    Schema for exchanging or revoking a refresh token.
+    """
+    refresh_token: str
 
 class TokenData(BaseModel):
     """
@@ -1,9 +1,7 @@
 import streamlit as st
 import requests
-import os
 
-# Define the API URL
-API_URL = os.getenv("API_URL", "http://localhost:8000")
+from api_client import send, start_session, ensure_session, end_session
 
 st.set_page_config(page_title="Personal Finance", page_icon="🫰", layout="wide")
 
@@ -11,6 +9,9 @@ st.set_page_config(page_title="Personal Finance", page_icon="🫰", layout="wide
 if "access_token" not in st.session_state:
     st.session_state["access_token"] = None
 
+# Renew the access token in the background; only log in again once the session itself ends.
+ensure_session()
+
 # --- 2. Helper Functions ---
 
 def login_user(email, password):
@@ -21,21 +22,23 @@ def login_user(email, password):
     :type email: str
     :param password: The plain-text password.
     :type password: str
-    :return: A dictionary containing `access_token` if successful, or `None` if failed.
+    :return: A dictionary containing `access_token` and `refresh_token` if successful, or `None` if failed.
     :rtype: dict | None
     """
-    url = f"{API_URL}/token"
     # OAuth2 expects form-data (username/password)
     payload = {"username": email, "password": password}
 
     try:
-        response = requests.post(url, data=payload)
+        response = send("POST", "token", data=payload)
         if response.status_code == 200:
             return response.json()
+        elif response.status_code == 503:
+            st.warning("The server is busy. Please try again in a moment.")
+            return None
         else:
             st.error("Invalid Email or Password")
             return None
-    except requests.exceptions.ConnectionError:
+    except requests.exceptions.RequestException:
         st.error("Connection Error: Is the backend running?")
         return None
     
@@ -52,7 +55,6 @@ def register_user(fullname, email, password):
     :return: `True` if registration was successful, `False` otherwise.
     :rtype: bool
     """
-    url = f"{API_URL}/users/"
     payload = {
         "full_name": fullname,
         "email": email,
@@ -60,21 +62,21 @@ def register_user(fullname, email, password):
     }
 
     try:
-        response = requests.post(url, json=payload)
+        response = send("POST", "users/", json=payload)
         if response.status_code == 200:
             return True
         else:
             st.error(f"Registration failed: {response.text}")
             return False
-    except requests.exceptions.ConnectionError:
+    except requests.exceptions.RequestException:
         st.error("Connection Error: is the backend running?")
         return False
     
 def logout_user():
     """
-    Clears the session state, effectively running the user out.
+    Revokes the session on the server and clears the session state, effectively running the user out.
     """
-    st.session_state.clear()
+    end_session()
     st.rerun()
 
 # --- 3. Main UI Logic  ---
@@ -96,12 +98,8 @@ if st.session_state["access_token"] is None:
                 if email_input and password_input:
                     token_data = login_user(email_input, password_input)
                     if token_data:
-                        new_token = token_data["access_token"]
-
                         st.session_state.clear()
-
-                        st.session_state["access_token"] = new_token
-                        st.session_state["user_email"] = email_input
+                        start_session(token_data, email_input)
 
                         st.success("Login Successful!")
                         st.rerun()
@@ -0,0 +1,287 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# (connect, read) timeouts in seconds, so a stuck backend can't freeze a page forever.
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+# Retries for connection errors, and for 502/503/504 on reads.
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+# Keep-alive connections to the backend, shared by every Streamlit session of this process.
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+
+# Refresh the access token this long before it expires.
+REFRESH_MARGIN_SECONDS = 60
+
+
+# --- HTTP session ---
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """
+    One pooled `requests.Session` per process. It carries no per-user state:
+    auth headers are added to each request.
+    """
+    retry = Retry(
+        total=API_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class LatencyStats:
+    """
+    Per-endpoint request latency, as seen by the frontend (including retries).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint: str, seconds: float, failed: bool = False):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {"count": 0, "errors": 0, "seconds_total": 0.0, "seconds_max": 0.0})
+            stats["count"] += 1
+            stats["errors"] += int(failed)
+            stats["seconds_total"] += seconds
+            stats["seconds_max"] = max(stats["seconds_max"], seconds)
+
+    def to_rows(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "Endpoint": endpoint,
+                    "Calls": stats["count"],
+                    "Errors": stats["errors"],
+                    "Avg (ms)": round(1000 * stats["seconds_total"] / stats["count"], 1),
+                    "Max (ms)": round(1000 * stats["seconds_max"], 1),
+                }
+                for endpoint, stats in sorted(self._endpoints.items())
+            ]
+
+
+@st.cache_resource
+def get_latency_stats() -> LatencyStats:
+    return LatencyStats()
+
+
+def _endpoint_label(method: str, path: str) -> str:
+    # Group "expenditures/42" and "expenditures/43" under one label.
+    return f"{method} /" + re.sub(r"/\d+(?=/|$)", "/{id}", path.strip("/"))
+
+
+def send(method: str, path: str, token: str | None = None, **kwargs) -> requests.Response:
+    """
+    Sends one request to the API through the shared session, with timeouts and latency tracking.
+
+    :param method: HTTP method.
+    :type method: str
+    :param path: API path, e.g. `"expenditures/"`.
+    :type path: str
+    :param token: Bearer token to send, if any.
+    :type token: str | None
+    :raises requests.exceptions.RequestException: When the backend can't be reached.
+    """
+    headers = kwargs.pop("headers", {})
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    kwargs.setdefault("timeout", (API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+
+    label = _endpoint_label(method, path)
+    started = time.perf_counter()
+    try:
+        response = get_session().request(method, f"{API_URL}/{path.lstrip('/')}", headers=headers, **kwargs)
+    except requests.exceptions.RequestException:
+        get_latency_stats().record(label, time.perf_counter() - started, failed=True)
+        raise
+    get_latency_stats().record(label, time.perf_counter() - started, failed=response.status_code >= 500)
+    return response
+
+
+# --- Authenticated session ---
+
+def start_session(token_data: dict, email: str):
+    """
+    Stores the tokens returned by `/token` (or `/token/refresh`) in the session state.
+
+    :param token_data: Response of the token endpoint.
+    :type token_data: dict
+    :param email: The user's email address.
+    :type email: str
+    """
+    st.session_state["access_token"] = token_data["access_token"]
+    st.session_state["refresh_token"] = token_data.get("refresh_token")
+    st.session_state["access_token_expires_at"] = time.time() + token_data.get("expires_in", 0)
+    st.session_state["user_email"] = email
+
+
+def refresh_session() -> bool:
+    """
+    Exchanges the refresh token for new tokens, without asking for the password.
+
+    :return: `True` if the session was renewed. On a rejected refresh token the user is logged out.
+    :rtype: bool
+    """
+    refresh_token = st.session_state.get("refresh_token")
+    if not refresh_token:
+        return False
+
+    try:
+        response = send("POST", "token/refresh", json={"refresh_token": refresh_token})
+    except requests.exceptions.RequestException:
+        # Keep the session: the current access token may still work.
+        return False
+
+    if response.status_code == 200:
+        start_session(response.json(), st.session_state.get("user_email"))
+        return True
+    st.session_state["access_token"] = None
+    st.session_state["refresh_token"] = None
+    return False
+
+
+def ensure_session() -> bool:
+    """
+    Whether the user is logged in, silently renewing the access token when it is about to expire.
+    Call it at the top of every page.
+
+    :rtype: bool
+    """
+    if st.session_state.get("access_token") is None:
+        return False
+
+    expires_at = st.session_state.get("access_token_expires_at")
+    if expires_at is not None and expires_at - time.time() < REFRESH_MARGIN_SECONDS:
+        refresh_session()
+    return st.session_state.get("access_token") is not None
+
+
+def end_session():
+    """
+    Revokes the refresh token on the server and clears the session state.
+    """
+    refresh_token = st.session_state.get("refresh_token")
+    if refresh_token:
+        try:
+            send("POST", "token/revoke", json={"refresh_token": refresh_token})
+        except requests.exceptions.RequestException:
+            pass
+    st.session_state.clear()
+
+
+# --- Calls made by the pages ---
+
+class ApiError(Exception):
+    """
+    A list endpoint could not be loaded. The message is meant for the user.
+    """
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_json(endpoint: str, token: str, params: tuple = ()):
+    """
+    Cached GET of a list endpoint. Streamlit re-runs the function if the token or the query changes.
+    Failures raise `ApiError`, so they are not cached. Safe to call from worker threads.
+
+    :param params: Query parameters, as sorted (name, value) pairs.
+    :type params: tuple
+    """
+    try:
+        response = send("GET", f"{endpoint}/", token=token, params=list(params))
+    except requests.exceptions.RequestException:
+        raise ApiError(f"Connection Error: Could not connect to the API to fetch {endpoint}.")
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 401:
+        raise ApiError("Session Expired. Please log in again.")
+    else:
+        raise ApiError(f"Failed to fetch {endpoint}. Status code: {response.status_code}")
+
+
+def _query(params: dict | None) -> tuple:
+    # Hashable, order-independent form of the query parameters; `None` values are left out.
+    return tuple(sorted((name, str(value)) for name, value in (params or {}).items() if value is not None))
+
+
+def get_many(endpoints: list[str], token: str, params: dict[str, dict] | None = None) -> dict:
+    """
+    Fetches several list endpoints at the same time, so a page waits for the slowest call
+    instead of the sum of all of them. Errors are shown on the page.
+
+    :param endpoints: API endpoints (e.g. ["categories", "payment_methods"]).
+    :type endpoints: list[str]
+    :param token: Current token for session.
+    :type token: str
+    :param params: Query parameters per endpoint, for the endpoints that take any.
+    :type params: dict[str, dict] | None
+    :return: The decoded JSON per endpoint, or an empty list for the ones that failed.
+    :rtype: dict
+    """
+    params = params or {}
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(endpoints), 1)) as pool:
+        futures = {
+            endpoint: pool.submit(_fetch_json, endpoint, token, _query(params.get(endpoint)))
+            for endpoint in endpoints
+        }
+    for endpoint, future in futures.items():
+        try:
+            results[endpoint] = future.result()
+        except ApiError as e:
+            st.error(str(e))
+            results[endpoint] = []
+    return results
+
+
+def get_data(endpoint: str, token: str, params: dict | None = None):
+    """
+    Fetches a single list endpoint (see `get_many`).
+
+    :param endpoint: API endpoint (e.g. "categories").
+    :type endpoint: str
+    :param token: Current token for session.
+    :type token: str
+    :param params: Query parameters.
+    :type params: dict | None
+    :return: The decoded JSON, or an empty list on failure.
+    """
+    return get_many([endpoint], token, params={endpoint: params})[endpoint]
+
+
+def request(method: str, path: str, **kwargs) -> requests.Response:
+    """
+    Sends a request as the logged-in user. A 401 triggers one token refresh and a retry.
+    """
+    ensure_session()
+    response = send(method, path, token=st.session_state.get("access_token"), **kwargs)
+    if response.status_code == 401 and refresh_session():
+        response = send(method, path, token=st.session_state.get("access_token"), **kwargs)
+    return response
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return request("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return request("POST", path, **kwargs)
+
+
+def delete(path: str, **kwargs) -> requests.Response:
+    return request("DELETE", path, **kwargs)
@@ -1,49 +1,25 @@
 import streamlit as st
-import requests
 import datetime
 from zoneinfo import ZoneInfo
 import pandas as pd
-import os
+
+import api_client
+from api_client import ensure_session, get_data, get_many
 
 # Page Configuration
 st.set_page_config(page_title="Tracker & Dashboard", page_icon="🤑", layout="wide")
 
-API_BASE_URL = os.getenv("API_URL", "http://localhost:8000")
+USER_TZ = "America/Sao_Paulo"
+# Rows per page in Recent Activity
+ACTIVITY_PAGE_SIZE = 50
 
 # --- Authentication check ---
-if "access_token" not in st.session_state or st.session_state["access_token"] is None:
+if not ensure_session():
     st.error("You are not logged in.")
     st.info("Please go to the **Home** page to log in.")
     st.stop()
 
-auth_headers = {"Authorization": f"Bearer {st.session_state['access_token']}"}
-
 # --- Helper functions ---
-@st.cache_data(ttl=60)
-def get_data(endpoint: str, token: str):
-    """
-    Streamlit re-runs the function if the token changes.
-    
-    :param endpoint: API endpoint.
-    :type endpoint: str
-    :param token: Current token for session.
-    :type token: str
-    """
-    local_headers = {"Authorization": f"Bearer {token}"}
-    try:
-        response = requests.get(f"{API_BASE_URL}/{endpoint}", headers=local_headers)
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 401:
-            st.error("Session Expired. Please log in again.")
-            return []
-        else:
-            st.error(f"Failed to fetch {endpoint}. Status code: {response.status_code}")
-            return []
-    except requests.exceptions.ConnectionError:
-        st.error(f"Connection Error: Could not connect to the API to fetch {endpoint}.")
-        return []
-
 def cascading_selectbox(label_primary, label_secondary, df, col_primary, col_secondary, force_na_if=None, help_text_secondary=""):
     primary_options = sorted(df[col_primary].unique()) if not df.empty else []
     selected_primary = st.selectbox(label_primary, options=primary_options, index=None, placeholder=f"Select {label_primary}...")
@@ -74,11 +50,63 @@ def cascading_selectbox(label_primary, label_secondary, df, col_primary, col_sec
     )
     return selected_primary, selected_secondary
 
+@st.cache_data(show_spinner=False)
+def build_activity_view(page: dict) -> pd.DataFrame:
+    """
+    Turns one columnar page of expenditures (`format=columnar`) into display-ready columns,
+    with vectorized operations. Cached per payload, so widget reruns don't rebuild it.
+
+    :param page: Expenditure page as returned by the API.
+    :type page: dict
+    :return: One row per expenditure: `expenditure_id`, the displayed columns, and a `label` for pickers.
+    :rtype: pd.DataFrame
+    """
+    if not page or not page.get("row_count"):
+        return pd.DataFrame()
+
+    raw = pd.DataFrame(page["columns"])
+    dims = page["dimensions"]
+    # Dimension values are looked up by ID: each one was sent once
+    users = pd.Series(dims["users"]["full_name"], index=dims["users"]["user_id"], dtype=object)
+    categories = pd.DataFrame(dims["categories"]).set_index("category_id")
+    methods = pd.Series(dims["payment_methods"]["method_name"], index=dims["payment_methods"]["payment_method_id"], dtype=object)
+
+    timestamps = pd.to_datetime(raw["transaction_timestamp"], utc=True).dt.tz_convert(USER_TZ)
+    prices = raw["price_cents"] / 100
+
+    view = pd.DataFrame({
+        "expenditure_id": raw["expenditure_id"],
+        "Timestamp": timestamps.dt.strftime("%d/%m/%Y %H:%M"),
+        "Paid By": raw["user_id"].map(users),
+        "Category": raw["category_id"].map(categories["primary_category"]),
+        "Sub-Category": raw["category_id"].map(categories["sub_category"]),
+        "Nature": raw["nature"],
+        "Shared?": raw["is_shared"].map({True: "✅ Yes", False: "👤 No"}).fillna("👤 No"),
+        "Payment Method": raw["payment_method_id"].map(methods),
+        "Price": prices,
+    })
+    view["label"] = timestamps.dt.strftime("%d/%m %H:%M") + " - $" + prices.map("{:.2f}".format)
+    return view
+
+def reset_activity_pages():
+    st.session_state["activity_cursors"] = [None]
+
 # --- Load Data ---
 token = st.session_state["access_token"]
 
-categories_data = get_data("categories", token)
-payment_methods_data = get_data("payment_methods", token)
+# Recent Activity is paged with the API's cursors; keep the ones of the pages visited so far.
+if "activity_cursors" not in st.session_state:
+    reset_activity_pages()
+activity_cursor = st.session_state["activity_cursors"][-1]
+
+# Everything the page needs, fetched in parallel
+page_data = get_many(
+    ["categories", "payment_methods", "expenditures"],
+    token,
+    params={"expenditures": {"limit": ACTIVITY_PAGE_SIZE, "cursor": activity_cursor, "format": "columnar"}},
+)
+categories_data = page_data["categories"]
+payment_methods_data = page_data["payment_methods"]
 
 categories_df = pd.DataFrame(categories_data)
 payment_methods_df = pd.DataFrame(payment_methods_data)
@@ -91,7 +119,7 @@ if categories_df.empty or payment_methods_df.empty:
 else:
     # --- UI LOGIC STARTS HERE ---
     if "selected_time" not in st.session_state:
-        user_tz = ZoneInfo("America/Sao_Paulo")
+        user_tz = ZoneInfo(USER_TZ)
 
         curr_time_brl = datetime.datetime.now(user_tz)
 
@@ -157,7 +185,7 @@ else:
                         # 3. Payload
                         dt_naive = datetime.datetime.combine(date_input, time_input)
 
-                        user_tz = ZoneInfo("America/Sao_Paulo")
+                        user_tz = ZoneInfo(USER_TZ)
                         dt_aware = dt_naive.replace(tzinfo=user_tz)
 
                         payload = {
@@ -171,10 +199,11 @@ else:
                         }
 
                         # 4. Request
-                        response = requests.post(f"{API_BASE_URL}/expenditures/", json=payload, headers=auth_headers)
+                        response = api_client.post("expenditures/", json=payload)
                         if response.status_code == 200:
                             st.success("Expenditure added successfully! ✅")
                             st.cache_data.clear()
+                            reset_activity_pages()
                             st.rerun()
                         else:
                             st.error(f"Error: {response.status_code} – {response.text}")
@@ -182,63 +211,59 @@ else:
                         st.error(f"Error processing request: {e}")
 
 
-# --- Dashboard (This can stay outside the else because it handles its own data fetch) ---
+# --- Dashboard (Outside the else: it only needs the expenditures loaded above) ---
 st.divider()
 st.header("📈 Recent Activity")
 
-# Fetch all expenditure data
-expenditure_data = get_data("expenditures", token)
+# Current page of expenditures (the API returns them newest first)
+expenditure_page = page_data["expenditures"]
+next_cursor = expenditure_page.get("next_cursor") if expenditure_page else None
 
-if not expenditure_data:
+activity_df = build_activity_view(expenditure_page)
+page_number = len(st.session_state["activity_cursors"])
+
+if activity_df.empty:
     st.info("No expenditures found.")
 else:
-    all_expenditures_df = pd.json_normalize(expenditure_data)
-    
-    if "transaction_timestamp" in all_expenditures_df.columns:
-        all_expenditures_df["transaction_timestamp"] = pd.to_datetime(all_expenditures_df["transaction_timestamp"])
-        
-        if all_expenditures_df["transaction_timestamp"].dt.tz is None:
-            all_expenditures_df["transaction_timestamp"] = all_expenditures_df["transaction_timestamp"].dt.tz_localize("UTC")
-
-        all_expenditures_df["transaction_timestamp"] = all_expenditures_df["transaction_timestamp"].dt.tz_convert("America/Sao_Paulo")    
-        all_expenditures_df = all_expenditures_df.sort_values(by="transaction_timestamp", ascending=False)
-
-    cols_to_display = {
-        "transaction_timestamp": "Timestamp",
-        "user.full_name": "Paid By",
-        "category.primary_category": "Category",
-        "category.sub_category": "Sub-Category",
-        "nature": "Nature",
-        "is_shared": "Shared?",
-        "payment_method.method_name": "Payment Method",
-        "price": "Price",
-    }
-    valid_cols = {k: v for k, v in cols_to_display.items() if k in all_expenditures_df}
-    
-    if valid_cols:
-        display_df = all_expenditures_df[valid_cols.keys()].rename(columns=valid_cols)
-        display_df["Timestamp"] = pd.to_datetime(display_df["Timestamp"]).dt.strftime("%d/%m/%Y %H:%M")
-        if "Shared?" in display_df.columns:
-            display_df["Shared?"] = display_df["Shared?"].apply(lambda x: "✅ Yes" if x else "👤 No")
-        
-        st.dataframe(display_df, width="stretch")
-
-        # Delete Utility
-        with st.expander("🗑️ Delete an Entry"):
-            delete_options = {
-                row["expenditure_id"]: f"{row['transaction_timestamp'].strftime('%d/%m %H:%M')} - ${row['price']:.2f}"
-                for _, row in all_expenditures_df.iterrows()
-            }
-            target_id = st.selectbox("Select entry to remove:", options=delete_options.keys(), format_func=lambda x: delete_options[x], index=None)
-            
-            if st.button("Confirm Delete", type="primary") and target_id:
-                try:
-                    res = requests.delete(f"{API_BASE_URL}/expenditures/{target_id}", headers=auth_headers)
-                    if res.status_code == 200:
-                        st.success("Entry removed!")
-                        st.cache_data.clear()
-                        st.rerun()
-                    else:
-                        st.error("Error deleting entry.")
-                except Exception as e:
-                    st.error(f"Connection error: {e}")
\ No newline at end of file
+    st.dataframe(activity_df.drop(columns=["expenditure_id", "label"]), width="stretch", hide_index=True)
+
+nav_prev, nav_page, nav_next = st.columns([1, 2, 1])
+if nav_prev.button("← Newer", disabled=page_number == 1):
+    st.session_state["activity_cursors"].pop()
+    st.rerun()
+nav_page.caption(f"Page {page_number}")
+if nav_next.button("Older →", disabled=not next_cursor):
+    st.session_state["activity_cursors"].append(next_cursor)
+    st.rerun()
+
+# Delete Utility
+with st.expander("🗑️ Delete an Entry"):
+    # Search on the server by day, instead of listing every expenditure here.
+    search_day = st.date_input("Day of the entry (leave empty to pick from the page above)", value=None, format="DD/MM/YYYY")
+    if search_day:
+        day_start = datetime.datetime.combine(search_day, datetime.time.min, tzinfo=ZoneInfo(USER_TZ))
+        day_page = get_data("expenditures", token, params={
+            "start_date": day_start.isoformat(),
+            "end_date": (day_start + datetime.timedelta(days=1)).isoformat(),
+            "limit": 500,
+            "format": "columnar",
+        })
+        candidates_df = build_activity_view(day_page)
+    else:
+        candidates_df = activity_df
+
+    delete_options = dict(zip(candidates_df["expenditure_id"], candidates_df["label"])) if not candidates_df.empty else {}
+    target_id = st.selectbox("Select entry to remove:", options=delete_options.keys(), format_func=lambda x: delete_options[x], index=None)
+
+    if st.button("Confirm Delete", type="primary") and target_id:
+        try:
+            res = api_client.delete(f"expenditures/{target_id}")
+            if res.status_code == 200:
+                st.success("Entry removed!")
+                st.cache_data.clear()
+                reset_activity_pages()
+                st.rerun()
+            else:
+                st.error("Error deleting entry.")
+        except Exception as e:
+            st.error(f"Connection error: {e}")
@@ -1,26 +1,25 @@
 import streamlit as st
 import requests
-import os
+import time
 
-st.set_page_config(page_title="Manage Settings", page_icon="⚙️", layout="wide")
+import api_client
+from api_client import API_URL, ensure_session, get_many
 
-API_BASE_URL = os.getenv("API_URL", "http://localhost:8000")
+st.set_page_config(page_title="Manage Settings", page_icon="⚙️", layout="wide")
 
 # --- Authentication Check ---
 # If the user lands here without logging in, stop them.
-if "access_token" not in st.session_state or st.session_state["access_token"] is None:
+if not ensure_session():
     st.error("You are not logged in.")
     st.info("Please go to the **Home** page to log in.", icon=":material/info:")
     st.stop()
 
-# Prepare headers for API calls
-auth_headers = {"Authorization": f"Bearer {st.session_state['access_token']}"}
             
 # --- Helper Functions ---
 
 def send_post_request(endpoint: str, payload: dict, success_message: str):
     """
-    Sends a POST request to the specified API endpoint with authentication headers
+    Sends an authenticated POST request to the specified API endpoint
 
     
     :param endpoint: The API route endpoint (e.g., "categories).
@@ -32,8 +31,7 @@ def send_post_request(endpoint: str, payload: dict, success_message: str):
     :return: None
     """
     try:
-        # Add headers
-        response = requests.post(f"{API_BASE_URL}/{endpoint}/", json=payload, headers=auth_headers)
+        response = api_client.post(f"{endpoint}/", json=payload)
         if response.status_code == 200:
             st.success(success_message)
             st.cache_data.clear()
@@ -47,7 +45,7 @@ def send_post_request(endpoint: str, payload: dict, success_message: str):
             st.error("Internal Server Error: Something went wrong on the server.")
         else:
             st.error(f"Error: {response.status_code}: – {response.text}")
-    except requests.exceptions.ConnectionError:
+    except requests.exceptions.RequestException:
         st.error("Connection Error: Could not connect to the API.")
 
 def delete_item(endpoint: str, item_id: int):
@@ -61,7 +59,7 @@ def delete_item(endpoint: str, item_id: int):
     :return: None
     """
     try:
-        response = requests.delete(f"{API_BASE_URL}/{endpoint}/{item_id}", headers=auth_headers)
+        response = api_client.delete(f"{endpoint}/{item_id}")
         if response.status_code == 200:
             st.success("Item deleted!")
             st.cache_data.clear()
@@ -73,40 +71,16 @@ def delete_item(endpoint: str, item_id: int):
     except requests.exceptions.RequestException as e:
         st.error(f"Request failed: {e}")
 
-@st.cache_data
-def get_data(endpoint: str, token:str):
-    """
-    Fetches data from the API with authentication headers.
-    
-    :param endpoint: The API route endpoint (e.g., "users").
-    :type endpoint: str
-    :param token: The Bearer token for authentication.
-    :type token: str
-    :return: A list of records from the API, or an empty list on failure.
-    :rtype: list
-    """
-    headers = {"Authorization": f"Bearer {token}"}
-    try:
-        response = requests.get(f"{API_BASE_URL}/{endpoint}/", headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 401:
-            st.warning("Session expired. Data could not be loaded.")
-            return []
-        else:
-            return []
-    except requests.exceptions.RequestException:
-        return []
-    
 # --- Main UI ---
 
 st.title("⚙️ Manage Settings")
 st.info("Use this page to add new Users, Categories, or Payment Methods.")
 
 # Fetch data
-users = get_data("users", st.session_state["access_token"])
-categories = get_data("categories", st.session_state["access_token"])
-payment_methods = get_data("payment_methods", st.session_state["access_token"])
+page_data = get_many(["users", "categories", "payment_methods"], st.session_state["access_token"])
+users = page_data["users"]
+categories = page_data["categories"]
+payment_methods = page_data["payment_methods"]
 
 col1, col2 = st.columns(2)
 
@@ -177,23 +151,63 @@ st.divider()
 st.header("Data Synchronization")
 st.info("Click the button below to manually trigger the ETL pipeline. This will extract data from the database, generate the Hyper file, and publish it to Tableau.")
 
+full_refresh = st.checkbox("Full rebuild", help="Rebuild the whole extract instead of applying only the latest changes.")
+
 if st.button("Run ETL Pipeline", type="primary"):
-    with st.spinner("Pipeline running... (This may take a moment)"):
-        try:
-            # Add headers
-            # Use the /refresh endpoint in backend
-            response = requests.post(f"{API_BASE_URL}/refresh", headers=auth_headers)
-
-            if response.status_code == 200:
-                data = response.json()
-                st.success("ETL Finished Successfully!")
-                st.json(data)
-            elif response.status_code == 401:
-                st.error("Session Expired. Please log in again.")
-            else:
-                st.error(f"Server Error: ({response.status_code})")
-                st.code(response.text)
-        
-        except requests.exceptions.ConnectionError:
-            st.error("Connection Failed")
-            st.warning(f"Could not reach the backend at `{API_BASE_URL}`. Is the Docker container running?")
\ No newline at end of file
+    try:
+        # Use the /refresh endpoint in backend. It queues the job and returns immediately.
+        response = api_client.post("refresh", params={"full_refresh": full_refresh})
+
+        if response.status_code == 202:
+            st.session_state["refresh_job_id"] = response.json()["job_id"]
+        elif response.status_code == 401:
+            st.error("Session Expired. Please log in again.")
+        else:
+            st.error(f"Server Error: ({response.status_code})")
+            st.code(response.text)
+
+    except requests.exceptions.RequestException:
+        st.error("Connection Failed")
+        st.warning(f"Could not reach the backend at `{API_URL}`. Is the Docker container running?")
+
+# Poll the job until it finishes (also resumes after a page rerun)
+if st.session_state.get("refresh_job_id"):
+    job_id = st.session_state["refresh_job_id"]
+    with st.status("Pipeline running... (This may take a moment)", expanded=True) as status_box:
+        stage_area = st.empty()
+        job = None
+        while True:
+            try:
+                res = api_client.get(f"refresh/{job_id}")
+            except requests.exceptions.RequestException:
+                status_box.update(label="Lost connection to the backend.", state="error")
+                break
+            if res.status_code != 200:
+                status_box.update(label=f"Could not load job status ({res.status_code}).", state="error")
+                del st.session_state["refresh_job_id"]
+                break
+
+            job = res.json()
+            stage_area.table([
+                {"Stage": stage["name"], "Status": stage["status"], "Seconds": stage["duration_seconds"]}
+                for stage in job["stages"]
+            ])
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(1)
+
+        if job and job["status"] == "succeeded":
+            status_box.update(label=f"ETL Finished Successfully! ({job['duration_seconds']}s)", state="complete")
+            del st.session_state["refresh_job_id"]
+        elif job and job["status"] == "failed":
+            status_box.update(label="ETL Failed", state="error")
+            st.error(job["error"])
+            del st.session_state["refresh_job_id"]
+
+# --- Diagnostics ---
+with st.expander("API latency (this frontend process)"):
+    latency_rows = api_client.get_latency_stats().to_rows()
+    if latency_rows:
+        st.dataframe(latency_rows, width="stretch")
+    else:
+        st.caption("No API calls recorded yet.")